@@ -0,0 +1,209 @@
+# Packed numeric arrays and the builtin functions that create and reduce them.
+#
+# A NumArray stores doubles in an array.array (8 bytes per element instead of
+# a pointer to a boxed float) and applies the arithmetic and comparison
+# operators element-wise, broadcasting scalars. Comparisons produce a mask of
+# 0/1 bytes that prints as booleans.
+
+import math
+import operator
+from array import array
+from itertools import repeat
+
+
+class NumArray:
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data  # array.array of "d" (numbers) or "B" (comparison mask)
+
+    @classmethod
+    def from_values(cls, values):
+        return cls(array("d", values))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        if self.data.typecode == "B":
+            return map(bool, self.data)
+        return iter(self.data)
+
+    def tolist(self):
+        return list(self)
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def _broadcast(self, other, op, typecode, reflected=False):
+        if isinstance(other, NumArray):
+            if len(other.data) != len(self.data):
+                raise ValueError(f"Array lengths differ: {len(self.data)} and {len(other.data)}")
+            right = other.data
+        elif isinstance(other, (int, float)):
+            right = repeat(other)
+        else:
+            return NotImplemented
+        if reflected:
+            return NumArray(array(typecode, map(op, right, self.data)))
+        return NumArray(array(typecode, map(op, self.data, right)))
+
+    def __add__(self, other):
+        return self._broadcast(other, operator.add, "d")
+
+    def __radd__(self, other):
+        return self._broadcast(other, operator.add, "d", True)
+
+    def __sub__(self, other):
+        return self._broadcast(other, operator.sub, "d")
+
+    def __rsub__(self, other):
+        return self._broadcast(other, operator.sub, "d", True)
+
+    def __mul__(self, other):
+        return self._broadcast(other, operator.mul, "d")
+
+    def __rmul__(self, other):
+        return self._broadcast(other, operator.mul, "d", True)
+
+    def __truediv__(self, other):
+        return self._broadcast(other, operator.truediv, "d")
+
+    def __rtruediv__(self, other):
+        return self._broadcast(other, operator.truediv, "d", True)
+
+    def __mod__(self, other):
+        return self._broadcast(other, operator.mod, "d")
+
+    def __rmod__(self, other):
+        return self._broadcast(other, operator.mod, "d", True)
+
+    def __pow__(self, other):
+        return self._broadcast(other, operator.pow, "d")
+
+    def __rpow__(self, other):
+        return self._broadcast(other, operator.pow, "d", True)
+
+    def __eq__(self, other):
+        return self._broadcast(other, operator.eq, "B")
+
+    def __ne__(self, other):
+        return self._broadcast(other, operator.ne, "B")
+
+    def __lt__(self, other):
+        return self._broadcast(other, operator.lt, "B")
+
+    def __le__(self, other):
+        return self._broadcast(other, operator.le, "B")
+
+    def __gt__(self, other):
+        return self._broadcast(other, operator.gt, "B")
+
+    def __ge__(self, other):
+        return self._broadcast(other, operator.ge, "B")
+
+    __hash__ = None
+
+    def __bool__(self):
+        raise ValueError("The truth value of an array is ambiguous")
+
+
+# Ints beyond this magnitude may not survive the trip through a double
+MAX_PACKED_INT = 2 ** 53
+
+
+def make_array(values):
+    # Value of an ARRAY literal: packed when every element is a float or an
+    # int a double holds exactly, otherwise a plain list as before
+    for value in values:
+        if type(value) is int:
+            if not -MAX_PACKED_INT <= value <= MAX_PACKED_INT:
+                return values
+        elif type(value) is not float:
+            return values
+    return NumArray.from_values(values)
+
+
+def _count(value):
+    if value != int(value) or value < 0:
+        raise ValueError(f"Expected a non-negative whole number, got {value}")
+    return int(value)
+
+
+def _range_length(start, stop, step):
+    if step == 0:
+        raise ValueError("range() step must not be zero")
+    if start == int(start) and stop == int(stop) and step == int(step):
+        return len(range(int(start), int(stop), int(step)))
+    return max(0, math.ceil((stop - start) / step))
+
+
+def builtin_range(start, stop=None, step=1.0):
+    # range(n) or range(start, stop[, step]) as floats
+    if stop is None:
+        start, stop = 0.0, start
+    if step == 0:
+        raise ValueError("range() step must not be zero")
+    if start == int(start) and stop == int(stop) and step == int(step):
+        return NumArray(array("d", range(int(start), int(stop), int(step))))
+    count = max(0, math.ceil((stop - start) / step))
+    return NumArray(array("d", (start + index * step for index in range(count))))
+
+
+def builtin_zeros(count):
+    return NumArray(array("d", bytes(8 * _count(count))))
+
+
+def builtin_fill(count, value):
+    return NumArray(array("d", [value]) * _count(count))
+
+
+def builtin_sum(values):
+    return sum(values.data if isinstance(values, NumArray) else values)
+
+
+def builtin_min(values):
+    return min(values.data if isinstance(values, NumArray) else values)
+
+
+def builtin_max(values):
+    return max(values.data if isinstance(values, NumArray) else values)
+
+
+def builtin_dot(left, right):
+    if len(left) != len(right):
+        raise ValueError(f"Array lengths differ: {len(left)} and {len(right)}")
+    return sum(map(operator.mul, left, right))
+
+
+def builtin_len(values):
+    return len(values)
+
+
+def builtin_result_bytes(func, args):
+    # Bytes of the array a builtin would build for args, worked out without
+    # building it; 0 for builtins that build none and for arguments the
+    # builtin will reject anyway
+    try:
+        if func is builtin_zeros or func is builtin_fill:
+            return 8 * _count(args[0])
+        if func is builtin_range:
+            if len(args) == 1:
+                return 8 * _range_length(0, args[0], 1)
+            return 8 * _range_length(args[0], args[1], args[2] if len(args) > 2 else 1)
+    except (ArithmeticError, IndexError, TypeError, ValueError):
+        pass
+    return 0
+
+
+# Functions callable by name when no user function of that name is defined
+BUILTINS = {
+    "range": builtin_range,
+    "zeros": builtin_zeros,
+    "fill": builtin_fill,
+    "sum": builtin_sum,
+    "min": builtin_min,
+    "max": builtin_max,
+    "dot": builtin_dot,
+    "len": builtin_len,
+}
@@ -0,0 +1,219 @@
+# On-disk cache of parsed (and optionally optimized) programs, in the spirit
+# of __pycache__.
+#
+# Entries are keyed by the SHA-256 of the script source, the opt level and a
+# fingerprint of the toolchain (this format version plus the source of the
+# lexer, node, parser and optimizer modules, and of the compiler module whose
+# operator table the optimizer folds with), so editing either the script
+# or the interpreter misses the old entry instead of loading it. Files that fail
+# validation are deleted and rebuilt, and prune() keeps the directory to
+# max_entries files, least recently used first. A cache directory that cannot
+# be written only costs the misses.
+#
+# The tree is stored flattened in post-order as a list of records and written
+# with marshal, so loading is one read plus one marshal.loads regardless of
+# how deeply the tree is nested.
+
+import hashlib
+import marshal
+import os
+import sys
+import time
+
+from astnode import ASTNode, building_tree
+from lexer import tokenize
+from optimizer import Optimizer
+from parser import Parser
+
+MAGIC = b"MLC2"
+CACHE_SUFFIX = ".mlc"
+DEFAULT_CACHE_DIR = "__mlcache__"
+
+# Record kinds in the flattened tree
+_NODE, _LIST, _VALUE = 0, 1, 2
+
+_toolchain_fingerprint = None
+
+
+def toolchain_fingerprint():
+    global _toolchain_fingerprint
+    if _toolchain_fingerprint is None:
+        digest = hashlib.sha256(MAGIC)
+        for module in ("lexer", "astnode", "parser", "compiler", "optimizer", "astcache"):
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module + ".py"), "rb") as handle:
+                digest.update(handle.read())
+        _toolchain_fingerprint = digest.hexdigest()
+    return _toolchain_fingerprint
+
+
+def serialize(program):
+    with building_tree():
+        return _flatten(program)
+
+
+def _flatten(program):
+    # Flatten the tree so that every record only refers to earlier records
+    records = []
+    types = {}
+    stack = [(program, False)]
+    results = []
+    while stack:
+        item, expanded = stack.pop()
+        if isinstance(item, list):
+            if not expanded:
+                stack.append((item, True))
+                stack.extend((child, False) for child in reversed(item))
+                continue
+            refs = results[len(results) - len(item):]
+            del results[len(results) - len(item):]
+            records.append((_LIST, refs))
+        elif hasattr(item, "type"):
+            if not expanded:
+                stack.append((item, True))
+                stack.extend((child, False) for child in reversed([item.left, item.right, item.children]))
+                continue
+            left, right, children = results[-3:]
+            del results[-3:]
+            type_id = types.setdefault(item.type, len(types))
+            records.append((_NODE, type_id, item.value, left, right, children, item.line))
+        else:
+            records.append((_VALUE, item))
+        results.append(len(records) - 1)
+    return marshal.dumps((list(types), records))
+
+
+def deserialize(data):
+    with building_tree():
+        return _rebuild(*marshal.loads(data))
+
+
+def _rebuild(type_names, records):
+    # Intern the type tags so they are shared with the parser's constants
+    type_names = [sys.intern(name) for name in type_names]
+    objects = []
+    append = objects.append
+    for record in records:
+        kind = record[0]
+        if kind == _NODE:
+            _, type_id, value, left, right, children, line = record
+            append(ASTNode(type_names[type_id], value, objects[left], objects[right], objects[children], line))
+        elif kind == _LIST:
+            append([objects[ref] for ref in record[1]])
+        else:
+            append(record[1])
+    return objects[-1]
+
+
+class ProgramCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=256):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.timings = {}  # Phase name -> seconds, for the last load
+
+    def path_for(self, source, opt_level):
+        digest = hashlib.sha256(source.encode("utf-8"))
+        digest.update(f"\0{opt_level}\0{toolchain_fingerprint()}".encode("ascii"))
+        return os.path.join(self.cache_dir, digest.hexdigest() + CACHE_SUFFIX)
+
+    def load(self, source, opt_level=0):
+        # Return the parsed program for source, from the cache when possible
+        self.timings = {}
+        start = time.perf_counter()
+        path = self.path_for(source, opt_level)
+        program = self.read(path)
+        self.timings["cache read"] = time.perf_counter() - start
+        if program is not None:
+            self.hits += 1
+            return program
+        self.misses += 1
+        program = self.parse(source, opt_level)
+        start = time.perf_counter()
+        self.write(path, program)
+        self.timings["cache write"] = time.perf_counter() - start
+        return program
+
+    def parse(self, source, opt_level=0):
+        # Lex, parse and optimize without touching the cache, recording timings
+        start = time.perf_counter()
+        program = Parser(tokenize(source)).parse_program()
+        self.timings["lex+parse"] = time.perf_counter() - start
+        if opt_level > 0:
+            start = time.perf_counter()
+            program = Optimizer(opt_level).optimize(program)
+            self.timings["optimize"] = time.perf_counter() - start
+        return program
+
+    def load_file(self, path, opt_level=0):
+        with open(path, encoding="utf-8") as handle:
+            return self.load(handle.read(), opt_level)
+
+    def read(self, path):
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+        except OSError:
+            return None
+        if data[:len(MAGIC)] == MAGIC:
+            try:
+                program = deserialize(memoryview(data)[len(MAGIC):])
+            except (EOFError, ValueError, TypeError, IndexError):
+                program = None
+            if program is not None:
+                try:
+                    os.utime(path)  # Mark as recently used for prune()
+                except OSError:
+                    return None
+                return program
+        # Corrupt or foreign file: drop it so that it is rebuilt
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    def write(self, path, program):
+        # Write to a temporary name and rename, so readers never see a
+        # partially written entry. Failing to write (read-only or full disk)
+        # leaves the entry missing, as if it had been pruned
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temporary, "wb") as handle:
+                handle.write(MAGIC)
+                handle.write(serialize(program))
+            os.replace(temporary, path)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return
+        self.prune()
+
+    def prune(self):
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith(CACHE_SUFFIX)]
+        except OSError:
+            return
+        if len(names) <= self.max_entries:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass  # Removed by another process meanwhile
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else ():
+            if name.endswith(CACHE_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, name))
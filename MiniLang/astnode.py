@@ -0,0 +1,51 @@
+# The AST node shared by the parser, the optimizer, the backends and the
+# AST cache.
+#
+# Nodes use __slots__, so each one is a fixed five-field object with no
+# per-instance dict. Leaves share the NO_CHILDREN tuple instead of owning an
+# empty list; code that rewrites a node assigns a new children list rather
+# than mutating the old one. Type tags are the string constants used by the
+# parser, which Python interns, so `node.type == "NUMBER"` is usually an
+# identity check. `line` is the source line the parser took the node from,
+# or None for nodes built by hand.
+
+import gc
+from contextlib import contextmanager
+
+NO_CHILDREN = ()
+
+# Allocations between young-generation collections while a tree is built
+TREE_GC_THRESHOLD = 100000
+
+
+class ASTNode:
+    __slots__ = ("type", "value", "left", "right", "children", "line")
+
+    def __init__(self, type_, value=None, left=None, right=None, children=None, line=None):
+        self.type = type_
+        self.value = value
+        self.left = left
+        self.right = right
+        self.children = children if children else NO_CHILDREN
+        self.line = line
+
+    def __copy__(self):
+        return ASTNode(self.type, self.value, self.left, self.right, self.children, self.line)
+
+    def __repr__(self):
+        return f"{self.type}({self.value})"
+
+
+@contextmanager
+def building_tree():
+    # Building a tree allocates one object per node and never forms a cycle,
+    # yet every collection of the older generations rescans all of it, so
+    # the time per node rose with the size of the tree. Collect less often
+    # while it grows rather than turning the cyclic GC off for the whole
+    # process, and restore the thresholds afterwards
+    thresholds = gc.get_threshold()
+    gc.set_threshold(max(thresholds[0], TREE_GC_THRESHOLD), *thresholds[1:])
+    try:
+        yield
+    finally:
+        gc.set_threshold(*thresholds)
@@ -0,0 +1,131 @@
+# Batch execution of many independent scripts across a pool of worker
+# processes.
+#
+# Each script is lexed, parsed and run by a fresh Interpreter in one of the
+# workers; the workers themselves stay alive for the whole batch (and for
+# every batch of a BatchRunner), so imports and other warm-up are paid once
+# per process. Results come back in input order as ScriptResult objects
+# holding the script's value, a snapshot of its global variables, or the
+# error that stopped it. A per-script timeout is enforced inside the worker
+# with an interval timer, so a runaway script fails on its own without
+# taking the worker down.
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from interpreter import Interpreter
+from lexer import tokenize
+from parser import Parser
+
+
+class ScriptTimeout(Exception):
+    pass
+
+
+class ScriptResult:
+    __slots__ = ("result", "variables", "error", "elapsed")
+
+    def __init__(self, result=None, variables=None, error=None, elapsed=0.0):
+        self.result = result
+        self.variables = variables  # Global variables when the script ended
+        self.error = error  # "ExceptionType: message", or None on success
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"ScriptResult(error={self.error!r})"
+        return f"ScriptResult(result={self.result!r})"
+
+
+def _raise_timeout(signum, frame):
+    raise ScriptTimeout("script timed out")
+
+
+def run_script(source, backend="tree", opt_level=0, timeout=None):
+    # Lex, parse and run one script, capturing any error in the result.
+    # Failed scripts still report the variables they had set
+    timer = timeout is not None and hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    start = time.perf_counter()
+    interpreter = Interpreter(backend=backend, opt_level=opt_level)
+    result = error = None
+    if timer:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    try:
+        try:
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            result = interpreter.run(Parser(tokenize(source)).parse_program())
+        finally:
+            # Disarm inside the outer try, so that an alarm firing while the
+            # script unwinds is still reported as its timeout
+            if timer:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except ScriptTimeout:
+        error = f"ScriptTimeout: exceeded {timeout} s"
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+    finally:
+        if timer:
+            signal.signal(signal.SIGALRM, previous)
+    return ScriptResult(result, dict(interpreter.variables), error, time.perf_counter() - start)
+
+
+# Options of the batch the current worker process belongs to, set once by
+# the pool initializer instead of being pickled with every script
+_worker_options = {}
+
+
+def _init_worker(options):
+    _worker_options.update(options)
+
+
+def _run_in_worker(source):
+    return run_script(source, **_worker_options)
+
+
+class BatchRunner:
+    def __init__(self, workers=None, backend="tree", opt_level=0, timeout=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.options = {"backend": backend, "opt_level": opt_level, "timeout": timeout}
+        self.pool = None
+
+    def start(self):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(self.options,))
+        return self
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(self, sources, chunksize=None):
+        # Return one ScriptResult per source, in order. Scripts are sent to
+        # the workers in chunks of chunksize (by default about four chunks
+        # per worker) to amortize the inter-process round trips
+        sources = list(sources)
+        if chunksize is None:
+            chunksize = max(1, len(sources) // (self.workers * 4))
+        self.start()
+        return list(self.pool.imap(_run_in_worker, sources, chunksize))
+
+
+def run_many(sources, workers=None, chunksize=None, timeout=None, backend="tree", opt_level=0):
+    # Run a batch on a pool that lives for this call only; keep a BatchRunner
+    # open instead to reuse the warm workers across batches
+    with BatchRunner(workers, backend, opt_level, timeout) as runner:
+        return runner.run(sources, chunksize)
@@ -0,0 +1,208 @@
+# Compiles AST nodes into nested Python closures. Each node is dispatched on
+# its type once, at compile time; running the result only calls closures.
+# Every closure takes a scope: an object with the global `variables` and
+# `functions` dicts and the current `frame` of local slots (the Interpreter
+# itself at top level).
+
+from arrays import BUILTINS, make_array
+from errors import ReturnException
+from lexer import number_value
+from resolver import FunctionInfo
+
+# Block closures kept before the cache starts over (an optimized program is
+# a new tree on every run)
+MAX_CACHED_BLOCKS = 4096
+
+
+# Scope of a function call: the shared globals and functions plus the
+# callee's own frame
+class CallScope:
+    __slots__ = ("variables", "functions", "frame")
+
+    def __init__(self, variables, functions, frame):
+        self.variables = variables
+        self.functions = functions
+        self.frame = frame
+
+
+# Builders for the arithmetic and comparison node types; the operator is
+# written inline so that no extra call happens per evaluation
+BINARY_BUILDERS = {
+    "ADD": lambda left, right: lambda scope: left(scope) + right(scope),
+    "SUB": lambda left, right: lambda scope: left(scope) - right(scope),
+    "MUL": lambda left, right: lambda scope: left(scope) * right(scope),
+    "DIV": lambda left, right: lambda scope: left(scope) / right(scope),
+    "MOD": lambda left, right: lambda scope: left(scope) % right(scope),
+    "POWER": lambda left, right: lambda scope: left(scope) ** right(scope),
+    "EQ": lambda left, right: lambda scope: left(scope) == right(scope),
+    "NEQ": lambda left, right: lambda scope: left(scope) != right(scope),
+    "GT": lambda left, right: lambda scope: left(scope) > right(scope),
+    "LT": lambda left, right: lambda scope: left(scope) < right(scope),
+    "LEQ": lambda left, right: lambda scope: left(scope) <= right(scope),
+    "GEQ": lambda left, right: lambda scope: left(scope) >= right(scope),
+}
+
+
+class ClosureCompiler:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.cache = {}  # id(block) -> (block, closure)
+        self.function_cache = {}  # id(FUNC_DEF node) -> (node, FunctionInfo, body closure)
+
+    def run(self, program, scope):
+        try:
+            return self.compile_block(program)(scope)
+        except ReturnException as signal:
+            return signal.value
+
+    def compile(self, node):
+        # Nodes are built as part of their block, which is what gets cached
+        return self.build(node)
+
+    def compile_block(self, block):
+        # Returns a closure running the statements and returning the last value
+        entry = self.cache.get(id(block))
+        if entry is None or entry[0] is not block:
+            if isinstance(block, list):
+                entry = (block, self.build_block(block))
+            else:
+                entry = (block, self.build(block))
+            if len(self.cache) >= MAX_CACHED_BLOCKS:
+                self.cache.clear()
+            self.cache[id(block)] = entry
+        return entry[1]
+
+    def build_block(self, block):
+        statements = tuple(self.compile(stmt) for stmt in block)
+        if not statements:
+            return lambda scope: None
+        if len(statements) == 1:
+            return statements[0]
+
+        def run_block(scope):
+            result = None
+            for statement in statements:
+                result = statement(scope)
+            return result
+        return run_block
+
+    def build(self, node):
+        node_type = node.type
+        if node_type == "NUMBER":
+            value = node.value
+            if type(value) is str:
+                value = number_value(value)
+            return lambda scope: value
+        elif node_type in ("STRING", "BOOLEAN"):
+            value = node.value
+            return lambda scope: value
+        elif node_type == "ID":
+            name = node.value
+            return lambda scope: scope.variables.get(name, None)
+        elif node_type == "LOCAL":
+            slot = node.value
+            return lambda scope: scope.frame[slot]
+        elif node_type in BINARY_BUILDERS:
+            return BINARY_BUILDERS[node_type](self.compile(node.left), self.compile(node.right))
+        elif node_type == "IF":
+            return self.build_if(node)
+        elif node_type == "WHILE":
+            return self.build_while(node)
+        elif node_type == "FOR":
+            return self.build_for(node)
+        elif node_type == "FUNC_DEF":
+            return lambda scope: self.interpreter.define_function(node)
+        elif node_type == "RETURN":
+            value = self.compile(node.children[0])
+
+            def return_value(scope):
+                raise ReturnException(value(scope))
+            return return_value
+        elif node_type == "FUNC_CALL":
+            return self.build_call(node)
+        elif node_type == "ASSIGN":
+            name = node.left.value
+            value = self.compile(node.right)
+            if node.left.type == "LOCAL":
+                def assign_local(scope):
+                    result = scope.frame[name] = value(scope)
+                    return result
+                return assign_local
+
+            def assign(scope):
+                result = scope.variables[name] = value(scope)
+                return result
+            return assign
+        elif node_type == "ARRAY":
+            elements = tuple(self.compile(child) for child in node.children)
+            return lambda scope: make_array([element(scope) for element in elements])
+        else:
+            raise ValueError(f"Unknown node type: {node_type}")
+
+    def build_if(self, node):
+        condition = self.compile(node.children[0])
+        body = self.compile_block(node.children[1])
+        else_body = self.compile_block(node.children[2]) if len(node.children) > 2 and node.children[2] else None
+
+        def run_if(scope):
+            if condition(scope):
+                return body(scope)
+            elif else_body:
+                return else_body(scope)
+        return run_if
+
+    def build_while(self, node):
+        condition = self.compile(node.children[0])
+        body = self.compile_block(node.children[1])
+
+        def run_while(scope):
+            while condition(scope):
+                body(scope)
+        return run_while
+
+    def build_for(self, node):
+        init = self.compile(node.children[0])
+        condition = self.compile(node.children[1])
+        update = self.compile(node.children[2])
+        body = self.compile_block(node.children[3])
+
+        def run_for(scope):
+            init(scope)
+            while condition(scope):
+                body(scope)
+                update(scope)
+        return run_for
+
+    def function(self, func):
+        entry = self.function_cache.get(id(func))
+        if entry is None or entry[0] is not func:
+            info = FunctionInfo(func)
+            entry = (func, info, self.compile_block(info.body))
+            if len(self.function_cache) >= MAX_CACHED_BLOCKS:
+                self.function_cache.clear()
+            self.function_cache[id(func)] = entry
+        return entry[1], entry[2]
+
+    def build_call(self, node):
+        name = node.value
+        args = tuple(self.compile(arg) for arg in node.children)
+
+        def call(scope):
+            func = scope.functions.get(name)
+            if not func:
+                if name in BUILTINS:
+                    return BUILTINS[name](*[arg(scope) for arg in args])
+                raise ValueError(f"Function {name} not defined")
+            info, body = self.function(func)
+            values = [arg(scope) for arg in args[:len(info.params)]]
+            variables = scope.variables
+
+            def invoke():
+                try:
+                    return body(CallScope(variables, scope.functions, info.new_frame(variables, values)))
+                except ReturnException as signal:
+                    return signal.value
+            if self.interpreter.memoized(func):
+                return self.interpreter.memo.call(func, values, invoke)
+            return invoke()
+        return call
@@ -0,0 +1,306 @@
+# Lowers Parser ASTs into bytecode for the stack VM in vm.py
+
+import operator
+
+from lexer import number_value
+from resolver import FunctionInfo
+
+# Opcodes. An instruction is a tuple whose first element is the opcode; the
+# remaining operands index the code object's constant pool (k), name table (n)
+# or instruction list (target), or hold the operator function (op) itself.
+LOAD_CONST = 0  # (k) push constants[k]
+LOAD_NAME = 1  # (n) push variables[names[n]], or None if unset
+STORE_NAME = 2  # (n) variables[names[n]] = top of stack, leaving it pushed
+STORE_NAME_POP = 3  # (n) pop into variables[names[n]]
+POP_TOP = 4
+JUMP = 5  # (target)
+JUMP_IF_FALSE = 6  # (target) pop and jump if the value is falsy
+BINARY_OP = 7  # (op) pop right, replace left with op(left, right)
+BINARY_OP_CONST = 8  # (op, k) replace top with op(top, constants[k])
+BINARY_OP_NAME = 9  # (op, n) replace top with op(top, variables[names[n]])
+BINARY_OP_NAME_CONST = 10  # (op, n, k) push op(variables[names[n]], constants[k])
+BINARY_OP_NAME_NAME = 11  # (op, n, n2) push op(variables[names[n]], variables[names[n2]])
+JUMP_UNLESS_NAME_CONST = 12  # (target, op, n, k) jump if not op(variables[names[n]], constants[k])
+CALL_FUNCTION = 13  # (k) constants[k] is (name, argc); pops argc arguments
+RETURN_VALUE = 14  # pop and return from the current code object
+BUILD_LIST = 15  # (count) pop count values into a list
+DEF_FUNCTION = 16  # (k) constants[k] is a FUNC_DEF node to register
+LOAD_FAST = 17  # (slot) push frame[slot]
+STORE_FAST = 18  # (slot) frame[slot] = top of stack, leaving it pushed
+STORE_FAST_POP = 19  # (slot) pop into frame[slot]
+BINARY_OP_FAST_CONST = 20  # (op, slot, k) push op(frame[slot], constants[k])
+JUMP_UNLESS_FAST_CONST = 21  # (target, op, slot, k) jump if not op(frame[slot], constants[k])
+# Superinstructions fusing the common pairs above, so that a loop step like
+# `i = i + 1` or `if (j > i)` is one dispatch instead of two
+STORE_NAME_OP_CONST = 22  # (n2, op, n, k) variables[names[n2]] = op(variables[names[n]], constants[k])
+STORE_FAST_OP_CONST = 23  # (slot2, op, slot, k) frame[slot2] = op(frame[slot], constants[k])
+JUMP_UNLESS_NAME_NAME = 24  # (target, op, n, n2) jump if not op(variables[names[n]], variables[names[n2]])
+BINARY_OP_TOP_NAME_CONST = 25  # (op, op2, n, k) replace top with op(top, op2(variables[names[n]], constants[k]))
+BINARY_OP_TOP_FAST_CONST = 26  # (op, op2, slot, k) replace top with op(top, op2(frame[slot], constants[k]))
+# (k) like CALL_FUNCTION, for a `return f(...)` in a function body: a user
+# function's code replaces the current one, whose RETURN_VALUE follows
+TAIL_CALL = 27
+
+OPCODE_NAMES = {
+    value: name for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
+
+# Operator functions behind the arithmetic and comparison node types
+BINARY_OPERATORS = {
+    "ADD": operator.add,
+    "SUB": operator.sub,
+    "MUL": operator.mul,
+    "DIV": operator.truediv,
+    "MOD": operator.mod,
+    "POWER": operator.pow,
+    "EQ": operator.eq,
+    "NEQ": operator.ne,
+    "LT": operator.lt,
+    "LEQ": operator.le,
+    "GT": operator.gt,
+    "GEQ": operator.ge,
+}
+OPERATOR_NAMES = {func: name for name, func in BINARY_OPERATORS.items()}
+
+
+class CodeObject:
+    def __init__(self, name, function=None):
+        self.name = name
+        self.function = function  # FunctionInfo of a function body, None at top level
+        self.instructions = []
+        self.constants = []  # Constant pool
+        self.names = []  # Variable names referenced by instructions
+
+    def disassemble(self):
+        lines = []
+        for offset, instruction in enumerate(self.instructions):
+            operands = []
+            for operand in instruction[1:]:
+                operands.append(OPERATOR_NAMES.get(operand, operand) if callable(operand) else operand)
+            lines.append(f"{offset:5d} {OPCODE_NAMES[instruction[0]]:24s} {' '.join(map(str, operands))}")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"<code {self.name}>"
+
+
+class Compiler:
+    def __init__(self, name="<program>", function=None):
+        self.code = CodeObject(name, function)
+        self._constant_index = {}
+        self._name_index = {}
+
+    def emit(self, *instruction):
+        self.code.instructions.append(instruction)
+        return len(self.code.instructions) - 1
+
+    def patch(self, offset, target):
+        # Point the jump at offset to target; the target is always operand one
+        instruction = self.code.instructions[offset]
+        self.code.instructions[offset] = (instruction[0], target) + instruction[2:]
+
+    def here(self):
+        return len(self.code.instructions)
+
+    def constant(self, value):
+        # Share pool slots between equal constants of the same type
+        if isinstance(value, (int, float, str, bool, tuple, type(None))):
+            key = (type(value), value)
+        else:
+            key = id(value)
+        if key not in self._constant_index:
+            self._constant_index[key] = len(self.code.constants)
+            self.code.constants.append(value)
+        return self._constant_index[key]
+
+    def name(self, name):
+        if name not in self._name_index:
+            self._name_index[name] = len(self.code.names)
+            self.code.names.append(name)
+        return self._name_index[name]
+
+    # Constant pool index for a literal node, or None if it is not one
+    def literal(self, node):
+        if node.type == "NUMBER":
+            value = node.value
+            return self.constant(number_value(value) if type(value) is str else value)
+        if node.type in ("STRING", "BOOLEAN"):
+            return self.constant(node.value)
+        return None
+
+    # Compile a block so that it pushes the value of its last statement
+    def compile_block(self, block):
+        if not isinstance(block, list):
+            block = [block]
+        if not block:
+            self.emit(LOAD_CONST, self.constant(None))
+            return
+        for stmt in block[:-1]:
+            self.compile_effect(stmt)
+        self.compile_value(block[-1])
+
+    # Compile a block whose value is discarded
+    def compile_block_effect(self, block):
+        if not isinstance(block, list):
+            block = [block]
+        for stmt in block:
+            self.compile_effect(stmt)
+
+    # Compile a statement for its side effects only (net stack effect zero)
+    def compile_effect(self, node):
+        if node.type == "ASSIGN":
+            start = self.here()
+            self.compile_value(node.right)
+            last = self.code.instructions[-1]
+            if self.here() == start + 1 and last[0] in (BINARY_OP_NAME_CONST, BINARY_OP_FAST_CONST):
+                # A lone `x op k` right side stores its result directly
+                if node.left.type == "LOCAL" and last[0] == BINARY_OP_FAST_CONST:
+                    self.code.instructions[-1] = (STORE_FAST_OP_CONST, node.left.value) + last[1:]
+                    return
+                if node.left.type == "ID" and last[0] == BINARY_OP_NAME_CONST:
+                    self.code.instructions[-1] = (STORE_NAME_OP_CONST, self.name(node.left.value)) + last[1:]
+                    return
+            if node.left.type == "LOCAL":
+                self.emit(STORE_FAST_POP, node.left.value)
+            else:
+                self.emit(STORE_NAME_POP, self.name(node.left.value))
+        elif node.type == "IF":
+            self.compile_if(node, self.compile_block_effect)
+        elif node.type in ("WHILE", "FOR"):
+            self.compile_loop(node)
+        elif node.type == "FUNC_DEF":
+            self.emit(DEF_FUNCTION, self.constant(node))
+        else:
+            self.compile_value(node)
+            self.emit(POP_TOP)
+
+    # Compile a node so that it pushes exactly one value
+    def compile_value(self, node):
+        node_type = node.type
+        k = self.literal(node)
+        if k is not None:
+            self.emit(LOAD_CONST, k)
+        elif node_type == "ID":
+            self.emit(LOAD_NAME, self.name(node.value))
+        elif node_type == "LOCAL":
+            self.emit(LOAD_FAST, node.value)
+        elif node_type in BINARY_OPERATORS:
+            self.compile_binary(node)
+        elif node_type == "ASSIGN":
+            self.compile_value(node.right)
+            if node.left.type == "LOCAL":
+                self.emit(STORE_FAST, node.left.value)
+            else:
+                self.emit(STORE_NAME, self.name(node.left.value))
+        elif node_type == "IF":
+            self.compile_if(node, self.compile_block)
+        elif node_type in ("WHILE", "FOR", "FUNC_DEF"):
+            self.compile_effect(node)
+            self.emit(LOAD_CONST, self.constant(None))
+        elif node_type == "RETURN":
+            value = node.children[0]
+            if value.type == "FUNC_CALL" and self.code.function is not None:
+                for arg in value.children:
+                    self.compile_value(arg)
+                self.emit(TAIL_CALL, self.constant((value.value, len(value.children))))
+            else:
+                self.compile_value(value)
+            self.emit(RETURN_VALUE)
+            # Unreachable, but keeps the one-value-per-node invariant
+            self.emit(LOAD_CONST, self.constant(None))
+        elif node_type == "FUNC_CALL":
+            for arg in node.children:
+                self.compile_value(arg)
+            self.emit(CALL_FUNCTION, self.constant((node.value, len(node.children))))
+        elif node_type == "ARRAY":
+            for child in node.children:
+                self.compile_value(child)
+            self.emit(BUILD_LIST, len(node.children))
+        else:
+            raise ValueError(f"Unknown node type: {node_type}")
+
+    def compile_binary(self, node):
+        # Operands that are variables or literals are folded into the
+        # instruction instead of being pushed separately
+        op = BINARY_OPERATORS[node.type]
+        left, right = node.left, node.right
+        right_k = self.literal(right)
+        if left.type == "ID" and right_k is not None:
+            self.emit(BINARY_OP_NAME_CONST, op, self.name(left.value), right_k)
+        elif left.type == "LOCAL" and right_k is not None:
+            self.emit(BINARY_OP_FAST_CONST, op, left.value, right_k)
+        elif left.type == "ID" and right.type == "ID":
+            self.emit(BINARY_OP_NAME_NAME, op, self.name(left.value), self.name(right.value))
+        else:
+            self.compile_value(left)
+            if right_k is not None:
+                self.emit(BINARY_OP_CONST, op, right_k)
+            elif right.type == "ID":
+                self.emit(BINARY_OP_NAME, op, self.name(right.value))
+            else:
+                start = self.here()
+                self.compile_value(right)
+                last = self.code.instructions[-1]
+                if self.here() == start + 1 and last[0] in (BINARY_OP_NAME_CONST, BINARY_OP_FAST_CONST):
+                    opcode = BINARY_OP_TOP_NAME_CONST if last[0] == BINARY_OP_NAME_CONST else BINARY_OP_TOP_FAST_CONST
+                    self.code.instructions[-1] = (opcode, op) + last[1:]
+                else:
+                    self.emit(BINARY_OP, op)
+
+    def compile_jump_if_false(self, condition):
+        # Emit a conditional jump with a placeholder target and return its offset
+        self.compile_value(condition)
+        last = self.code.instructions[-1]
+        if last[0] in (BINARY_OP_NAME_CONST, BINARY_OP_FAST_CONST, BINARY_OP_NAME_NAME):
+            opcode = {
+                BINARY_OP_NAME_CONST: JUMP_UNLESS_NAME_CONST,
+                BINARY_OP_FAST_CONST: JUMP_UNLESS_FAST_CONST,
+                BINARY_OP_NAME_NAME: JUMP_UNLESS_NAME_NAME,
+            }[last[0]]
+            self.code.instructions[-1] = (opcode, None) + last[1:]
+            return self.here() - 1
+        return self.emit(JUMP_IF_FALSE, None)
+
+    def compile_if(self, node, compile_branch):
+        condition, body, else_body = (node.children + [None, None])[:3]
+        jump_to_else = self.compile_jump_if_false(condition)
+        compile_branch(body)
+        jump_to_end = self.emit(JUMP, None)
+        self.patch(jump_to_else, self.here())
+        if else_body:
+            compile_branch(else_body)
+        elif compile_branch == self.compile_block:
+            self.emit(LOAD_CONST, self.constant(None))
+        self.patch(jump_to_end, self.here())
+
+    def compile_loop(self, node):
+        if node.type == "FOR":
+            init, condition, update, body = node.children
+            self.compile_effect(init)
+        else:
+            condition, body = node.children
+            update = None
+        top = self.here()
+        exit_jump = self.compile_jump_if_false(condition)
+        self.compile_block_effect(body)
+        if update is not None:
+            self.compile_effect(update)
+        self.emit(JUMP, top)
+        self.patch(exit_jump, self.here())
+
+
+def compile_program(program, name="<program>"):
+    compiler = Compiler(name)
+    compiler.compile_block(program)
+    compiler.emit(RETURN_VALUE)
+    return compiler.code
+
+
+def compile_function(func):
+    # The body is compiled from its resolved form, with locals in frame slots
+    function = FunctionInfo(func)
+    compiler = Compiler(func.value, function)
+    compiler.compile_block(function.body)
+    compiler.emit(RETURN_VALUE)
+    return compiler.code
@@ -0,0 +1,26 @@
+# Control-flow signals and errors shared by the execution backends
+
+
+# Raised by a RETURN node and caught by the enclosing function call
+class ReturnException(Exception):
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+
+# Raised on the tree walker by a RETURN of a call to a user function; the
+# enclosing call_function runs the callee in place of the returning function
+# instead of nesting it, so tail recursion needs no stack. key is the memo
+# key of a memoized callee, stored with the value the call chain returns
+class TailCall(Exception):
+    def __init__(self, info, args, key=None):
+        super().__init__(info.name)
+        self.info = info
+        self.args = args
+        self.key = key
+
+
+# Raised by Interpreter.run_async when a script uses more steps or memory
+# than it was given
+class BudgetExceeded(ValueError):
+    pass
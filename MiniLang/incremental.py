@@ -0,0 +1,270 @@
+# Incremental re-lexing and re-parsing of an edited source, for REPLs and
+# editors that need the tokens and AST after every keystroke.
+#
+# A Document holds a source with its tokens and top-level statements. An
+# edit (offset, deleted length, inserted text) rescans from the last token
+# before the edit until the scan lines up with an old token again, and
+# reparses from the statement before the damaged tokens (the parser looks one
+# token past a statement's end) until a statement starts where an old one
+# did. Everything else is reused, so the work depends on the size of the
+# edit, not of the file. The result is what tokenize() and
+# Parser.parse_program() give for the new source.
+#
+# Positions after an edit move: token offsets, token lines and statement
+# start indexes, and the lines of reused nodes when the edit adds or removes
+# line breaks. These shifts are recorded lazily (see Shifted) and applied
+# only to the items between successive edits, or to everything when the
+# tokens or program are read. Reused nodes are updated in place.
+#
+# A source that does not parse keeps its tokens and the statements around
+# the error; Document.error holds the parser's exception and reading
+# Document.program raises it. The next edit reparses from the failed
+# statement.
+
+from bisect import bisect_left, bisect_right
+
+from lexer import scan_tokens
+from parser import Parser
+
+
+# A list whose items from index `start` on still owe the shift `pending`, like
+# the text after the gap of a gap buffer. Moving the boundary costs the
+# distance between successive edits, so a run of edits in one place costs
+# nothing for the items after it
+class Shifted:
+    def __init__(self, items, shift):
+        self.items = items
+        self.shift = shift  # shift(item, delta) -> shifted item
+        self.start = len(items)
+        self.pending = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        item = self.items[index]
+        if self.pending and index >= self.start:
+            return self.shift(item, self.pending)
+        return item
+
+    def settle(self, stop):
+        # Make items[:stop] exact
+        if stop > self.start:
+            if self.pending:
+                items = self.items
+                shift = self.shift
+                pending = self.pending
+                for index in range(self.start, stop):
+                    items[index] = shift(items[index], pending)
+            self.start = stop
+
+    def move(self, index, delta):
+        # Shift items[index:] by delta
+        if not delta:
+            return
+        if not self.pending:
+            self.start = index
+        elif index >= self.start:
+            self.settle(index)
+        else:
+            # Items from index on owe the shift from now on
+            items = self.items
+            for position in range(index, self.start):
+                items[position] = self.shift(items[position], -self.pending)
+            self.start = index
+        self.pending += delta
+
+    def splice(self, begin, end, new_items):
+        # Replace items[begin:end] with exact new items
+        self.settle(begin)
+        if self.start <= end:
+            start = begin + len(new_items)
+        else:
+            start = self.start + len(new_items) - (end - begin)
+        self.items[begin:end] = new_items
+        self.start = start
+
+    def exact(self):
+        self.settle(len(self.items))
+        return self.items
+
+
+def shift_token(token, lines):
+    return (token[0], token[1], token[2] + lines, token[3])
+
+
+def shift_offset(offset, delta):
+    return offset + delta
+
+
+def shift_node_lines(tree, lines):
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif hasattr(item, "type"):
+            if item.line is not None:
+                item.line += lines
+            stack.append(item.left)
+            stack.append(item.right)
+            stack.extend(item.children)
+    return tree
+
+
+class Document:
+    def __init__(self, source=""):
+        self.source = ""
+        self.token_list = Shifted([], shift_token)
+        self.offsets = Shifted([], shift_offset)  # Start offset of each token
+        self.starts = Shifted([], shift_offset)  # First token index of each top-level statement
+        self.quotes = []  # Token indexes of unterminated '"' (MISMATCH tokens)
+        self.statements = Shifted([], shift_node_lines)
+        # Token range [begin, end) that is not covered by parsed statements
+        # because the source does not parse there, with the error raised
+        self.damaged = None
+        self.error = None
+        self.relexed = 0  # Tokens scanned by the last edit
+        self.reparsed = 0  # Statements parsed by the last edit
+        self.edit(0, 0, source)
+
+    @property
+    def tokens(self):
+        return list(self.token_list.exact())
+
+    # The parsed statements, or the parser's error for the current source
+    @property
+    def program(self):
+        if self.error is not None:
+            raise type(self.error)(*self.error.args)
+        return list(self.statements.exact())
+
+    def edit(self, offset, deleted, inserted):
+        # Replace source[offset:offset + deleted] with inserted. A source
+        # that does not parse leaves its error in self.error, and further
+        # edits can fix it
+        if not 0 <= offset <= offset + deleted <= len(self.source):
+            raise ValueError(f"Edit {offset}:{offset + deleted} is outside the source (length {len(self.source)})")
+        self.source = self.source[:offset] + inserted + self.source[offset + deleted:]
+        begin, end, count, lines = self.relex(offset, deleted, len(inserted))
+        self.reparse(begin, end, count, lines)
+
+    def relex(self, offset, deleted, inserted):
+        # Rescan the edited region and splice the new tokens in. Returns the
+        # replaced old token range, the number of new tokens and the line
+        # shift of the tokens after them
+        tokens, offsets = self.token_list, self.offsets
+        delta = inserted - deleted
+        edit_end = offset + inserted  # End of the inserted text in the new source
+        begin = bisect_left(offsets, offset) - 1
+        if self.quotes and self.quotes[0] < begin:
+            # A quote that found no closing one may find it in the edit
+            begin = self.quotes[0]
+        if begin >= 0:
+            # Otherwise tokens do not depend on the text before them, so
+            # scanning can restart at any old token start
+            token = tokens[begin]
+            position = offsets[begin]
+            line_number, line_start = token[2], position - token[3] + 1
+        else:
+            begin, position, line_number, line_start = 0, 0, 1, 0
+        new_tokens = []
+        new_offsets = []
+        end = begin
+        size = len(tokens)
+        lines = 0
+        resynced = None
+        for token, start in scan_tokens(self.source, position, line_number, line_start):
+            if start > edit_end:
+                # In the unchanged tail: stop at the first old token that
+                # starts at the same shifted place
+                old_start = start - delta
+                while end < size and offsets[end] < old_start:
+                    end += 1
+                if end < size and offsets[end] == old_start:
+                    old = tokens[end]
+                    if old[0] == token[0] and old[1] == token[1]:
+                        lines = token[2] - old[2]
+                        resynced = (old, token)
+                        break
+            new_tokens.append(token)
+            new_offsets.append(start)
+        else:
+            end = size
+        self.relexed = len(new_tokens)
+        shift = len(new_tokens) - (end - begin)
+        self.quotes = [index for index in self.quotes if index < begin] + [
+            begin + index for index, token in enumerate(new_tokens) if token[0] == "MISMATCH" and token[1] == '"'
+        ] + [index + shift for index in self.quotes if index >= end]
+        tokens.splice(begin, end, new_tokens)
+        offsets.splice(begin, end, new_offsets)
+        after = begin + len(new_tokens)
+        offsets.move(after, delta)
+        tokens.move(after, lines)
+        if resynced is not None and resynced[0][3] != resynced[1][3]:
+            # Tokens on the resynchronized line also moved sideways
+            old, token = resynced
+            columns = token[3] - old[3]
+            stop = after
+            while stop < len(tokens) and tokens[stop][2] == token[2]:
+                stop += 1
+            tokens.settle(stop)
+            items = tokens.items
+            for index in range(after, stop):
+                item = items[index]
+                items[index] = (item[0], item[1], item[2], item[3] + columns)
+        return begin, end, len(new_tokens), lines
+
+    def reparse(self, begin, end, count, lines):
+        # Reparse the statements over the rescanned tokens old [begin, end),
+        # now count new ones, and over what an earlier edit left unparsed
+        starts, statements = self.starts, self.statements
+        low, high = begin, end
+        if self.damaged is not None:
+            low, high = min(low, self.damaged[0]), max(high, self.damaged[1])
+        # The statement holding the token before the damage may end
+        # differently, since the parser looked at that token
+        first = max(bisect_right(starts, low - 1) - 1, 0)
+        position = starts[first] if first < len(starts) and starts[first] < low else 0
+        following = bisect_left(starts, high)
+        shift = count - (end - begin)
+        starts.move(following, shift)
+        high += shift
+        new_starts = []
+        new_nodes = []
+        self.damaged = self.error = None
+        parser = Parser(self.token_source(position))
+        stream = parser.stream
+        try:
+            while parser.current_token is not None:
+                position = self.scanned - (len(stream.buffer) - stream.index)
+                while following < len(starts) and starts[following] < position:
+                    following += 1
+                if position >= high and following < len(starts) and starts[following] == position:
+                    # Back in step with the old statements
+                    break
+                if parser.current_token[0] == "RBRACE":
+                    raise SyntaxError(f"Unexpected token: {parser.current_token}")
+                new_nodes.append(parser.parse_statement())
+                new_starts.append(position)
+            else:
+                following = len(starts)
+        except Exception as error:
+            # Keep what parsed and the old statements after the tokens the
+            # parser got to; the next edit reparses from the failed statement
+            failed = self.scanned - (len(stream.buffer) - stream.index)
+            self.damaged = (position, max(high, failed + 1))
+            self.error = error
+            while following < len(starts) and starts[following] < self.damaged[1]:
+                following += 1
+        self.reparsed = len(new_nodes)
+        starts.splice(first, following, new_starts)
+        statements.splice(first, following, new_nodes)
+        statements.move(first + len(new_nodes), lines)
+
+    def token_source(self, start):
+        tokens = self.token_list
+        self.scanned = start
+        for index in range(start, len(tokens)):
+            self.scanned = index + 1
+            yield tokens[index]
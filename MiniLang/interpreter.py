@@ -1,17 +1,121 @@
+import asyncio
+
+from arrays import BUILTINS, make_array
+from closures import ClosureCompiler
+from errors import BudgetExceeded, ReturnException, TailCall
+from lexer import number_value
+from memo import MISSING, Memoizer
+from optimizer import Optimizer
+from profiler import TOP_LEVEL, Profiler
+from resolver import UNSET, FunctionInfo, GlobalTable, resolve_globals
+from stackeval import StackEvaluator
+from transpiler import Transpiler
+from vm import VM
+
+# Execution backends selectable through Interpreter(backend=...)
+BACKENDS = ("tree", "vm", "closure", "stack", "python")
+# FunctionInfos kept before function_infos starts over; the optimizer hands
+# out new FUNC_DEF nodes on every run
+MAX_FUNCTION_INFOS = 1024
+
+
 class Interpreter:
-    def __init__(self):
-        self.variables = {}  # Holds variable names and values
+    def __init__(self, backend="tree", opt_level=0, memo_size=0, pure_functions=(), profile=False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if profile and backend != "tree":
+            raise ValueError("Profiling is only supported on the tree backend")
+        self.backend = backend
+        self.optimizer = Optimizer(opt_level) if opt_level > 0 else None
+        # Calls to pure functions go through an LRU cache of memo_size results
+        self.memo = Memoizer(memo_size, pure_functions) if memo_size > 0 else None
+        # The tree and stack backends bind global names to slots of a
+        # GlobalTable, which also offers the dict API; the compiling backends
+        # resolve names when they compile and keep a plain dict
+        self.globals = GlobalTable() if backend in ("tree", "stack") else None
+        self.variables = self.globals if self.globals is not None else {}  # Holds variable names and values
+        self.global_values = self.globals.cells if self.globals is not None else None
         self.functions = {}  # Holds function definitions
+        self.functions_version = 0  # Bumped whenever a name is bound to another function
+        self.frame = None  # Local slots of the function call being executed
+        self.function_infos = {}  # id(FUNC_DEF node) -> (node, FunctionInfo)
+        self.vm = VM(self) if backend == "vm" else None
+        self.closures = ClosureCompiler(self) if backend == "closure" else None
+        self.stack = StackEvaluator(self) if backend == "stack" else None
+        self.transpiler = Transpiler(self) if backend == "python" else None
+        # Profiling swaps in timed versions of evaluate and call_function, so
+        # the unprofiled methods pay nothing for it
+        self.profiler = Profiler() if profile else None
+        if profile:
+            self.evaluate = self.profiled_evaluate
+            self.call_function = self.profiled_call_function
+
+    def run(self, program):
+        # Execute a statement or a list of statements on the selected backend
+        # and return the value of the last one (or of a top-level return)
+        if self.optimizer is not None:
+            program = self.optimizer.optimize(program)
+        if self.vm is not None:
+            return self.vm.run(program)
+        if self.closures is not None:
+            return self.closures.run(program, self)
+        if self.transpiler is not None:
+            return self.transpiler.run(program)
+        program = resolve_globals(program, self.globals)
+        if self.stack is not None:
+            return self.stack.run(program)
+        if self.profiler is not None:
+            self.profiler.enter_call(TOP_LEVEL)
+        try:
+            return self.execute_block(program)
+        except ReturnException as signal:
+            return signal.value
+        finally:
+            if self.profiler is not None:
+                self.profiler.exit_call()
+
+    async def run_async(self, program, slice_steps=1000, max_steps=None, max_memory=None):
+        # Run on the stack evaluator, whatever the backend, yielding to the
+        # event loop after every slice_steps node evaluations so that other
+        # scripts and tasks get their turn. max_steps limits the total node
+        # evaluations and max_memory the estimated bytes the script holds,
+        # checked at every slice boundary (and for each new string, list or
+        # array as it is built)
+        if self.optimizer is not None:
+            program = self.optimizer.optimize(program)
+        if self.globals is not None:
+            program = resolve_globals(program, self.globals)
+        evaluator = self.stack or StackEvaluator(self)
+        execution = evaluator.start(program, max_memory)
+        while True:
+            limit = slice_steps
+            if max_steps is not None:
+                if execution.steps >= max_steps:
+                    raise BudgetExceeded(f"Step budget of {max_steps} exceeded")
+                limit = min(limit, max_steps - execution.steps)
+            if evaluator.resume(execution, limit):
+                return execution.result
+            if max_memory is not None and execution.memory(self.variables) > max_memory:
+                raise BudgetExceeded(f"Memory budget of {max_memory} bytes exceeded")
+            await asyncio.sleep(0)
 
     def evaluate(self, node):
         if node.type == "NUMBER":
-            return float(node.value)
+            # The parser stores the int or float value; nodes built by hand
+            # may still hold the literal's text
+            value = node.value
+            return number_value(value) if type(value) is str else value
+        elif node.type == "GLOBAL":
+            value = self.global_values[node.value]
+            return None if value is UNSET else value
         elif node.type == "STRING":
             return node.value
         elif node.type == "BOOLEAN":
             return node.value
         elif node.type == "ID":
             return self.variables.get(node.value, None)
+        elif node.type == "LOCAL":
+            return self.frame[node.value]
         elif node.type == "ADD":
             return self.evaluate(node.left) + self.evaluate(node.right)
         elif node.type == "SUB":
@@ -36,6 +140,8 @@ class Interpreter:
             return self.evaluate(node.left) <= self.evaluate(node.right)
         elif node.type == "GEQ":
             return self.evaluate(node.left) >= self.evaluate(node.right)
+        elif node.type == "CALL":
+            return self.execute_call_site(node)
         elif node.type == "IF":
             condition = self.evaluate(node.children[0])
             if condition:
@@ -51,7 +157,12 @@ class Interpreter:
                 self.execute_block(node.children[3])  # Loop body
                 self.evaluate(node.children[2])  # Update
         elif node.type == "FUNC_DEF":
-            self.functions[node.value] = node
+            self.define_function(node)
+        elif node.type == "RETURN":
+            value = node.children[0]
+            if (value.type == "CALL" or value.type == "FUNC_CALL") and self.frame is not None:
+                self.tail_call(value)
+            raise ReturnException(self.evaluate(value))
         elif node.type == "FUNC_CALL":
             return self.execute_function_call(node)
         elif node.type == "ASSIGN":
@@ -62,6 +173,8 @@ class Interpreter:
             raise ValueError(f"Unknown node type: {node.type}")
 
     def execute_block(self, block):
+        if not isinstance(block, list):
+            block = [block]
         result = None
         for stmt in block:
             result = self.evaluate(stmt)
@@ -69,27 +182,133 @@ class Interpreter:
 
     def assign_variable(self, node):
         # Handle assignment
-        var_name = node.left.value
         value = self.evaluate(node.right)
-        self.variables[var_name] = value
+        if node.left.type == "GLOBAL":
+            self.global_values[node.left.value] = value
+        elif node.left.type == "LOCAL":
+            self.frame[node.left.value] = value
+        else:
+            self.variables[node.left.value] = value
         return value
 
+    def function_info(self, func):
+        entry = self.function_infos.get(id(func))
+        if entry is None or entry[0] is not func:
+            info = FunctionInfo(func)
+            if self.globals is not None:
+                info.body = resolve_globals(info.body, self.globals)
+            entry = (func, info)
+            if len(self.function_infos) >= MAX_FUNCTION_INFOS:
+                self.function_infos.clear()
+            self.function_infos[id(func)] = entry
+        return entry[1]
+
+    def define_function(self, func):
+        previous = self.functions.get(func.value)
+        self.functions[func.value] = func
+        if previous is not func:
+            self.functions_version += 1
+            if self.memo is not None and previous is not None:
+                self.memo.clear()
+
+    def memoized(self, func):
+        # Whether calls to func should go through the memo cache
+        return self.memo is not None and self.memo.is_pure(func, self.functions)
+
     def execute_function_call(self, node):
         func = self.functions.get(node.value)
+        info = self.function_info(func) if func else None
+        return self.call_with(node.value, func, info, node.children)
+
+    def execute_call_site(self, node):
+        # A resolved FUNC_CALL: the callee is looked up again only after a
+        # function has been defined or redefined
+        site = node.value
+        if site.version != self.functions_version:
+            self.refresh_call_site(site)
+        return self.call_with(site.name, site.func, site.info, node.children)
+
+    def refresh_call_site(self, site):
+        site.func = self.functions.get(site.name)
+        site.info = self.function_info(site.func) if site.func else None
+        site.version = self.functions_version
+
+    def tail_call(self, node):
+        # Leave the current function for the user function a returned call
+        # reaches. Builtins are called normally, and so is everything while
+        # profiling, which counts every call. A memoized callee returns a
+        # cached result directly, or leaves its key to call_function
+        if node.type == "CALL":
+            site = node.value
+            if site.version != self.functions_version:
+                self.refresh_call_site(site)
+            func, info = site.func, site.info
+        else:
+            func = self.functions.get(node.value)
+            info = self.function_info(func) if func else None
+        if not func or self.profiler is not None:
+            return
+        args = [self.evaluate(arg) for arg in node.children[:len(info.params)]]
+        key = None
+        if self.memoized(func):
+            key, result = self.memo.lookup(func, args)
+            if result is not MISSING:
+                raise ReturnException(result)
+        raise TailCall(info, args, key)
+
+    def call_with(self, name, func, info, arg_nodes):
         if not func:
-            raise ValueError(f"Function {node.value} not defined")
-        
-        # Execute function call and pass arguments
-        local_vars = self.variables.copy()  # Create a local environment for the function
-        for param, arg in zip(func.children, node.children):
-            local_vars[param] = self.evaluate(arg)
-        
-        # Execute the function body
-        interpreter = Interpreter()
-        interpreter.variables = local_vars
-        result = interpreter.execute_block(func.children[-1])
-        return result
+            if name in BUILTINS:
+                return BUILTINS[name](*[self.evaluate(arg) for arg in arg_nodes])
+            raise ValueError(f"Function {name} not defined")
+        args = [self.evaluate(arg) for arg in arg_nodes[:len(info.params)]]
+        if self.memoized(func):
+            return self.memo.call(func, args, lambda: self.call_function(info, args))
+        return self.call_function(info, args)
+
+    def call_function(self, info, args):
+        # Run the resolved body in a new frame; globals stay shared through
+        # self.variables. A tail call replaces the frame and runs the
+        # callee's body in the same loop; memoized callees on the way all
+        # return the final value
+        caller_frame = self.frame
+        keys = None
+        try:
+            while True:
+                self.frame = info.new_frame(self.variables, args)
+                try:
+                    result = self.execute_block(info.body)
+                except ReturnException as signal:
+                    result = signal.value
+                except TailCall as call:
+                    info, args = call.info, call.args
+                    if call.key is not None:
+                        if keys is None:
+                            keys = []
+                        self.memo.chain(keys, call.key)
+                    continue
+                if keys is not None:
+                    # Innermost first, as nested calls would have stored them
+                    for key in reversed(keys):
+                        self.memo.store(key, result)
+                return result
+        finally:
+            self.frame = caller_frame
 
     def evaluate_array(self, node):
-        # Evaluate an array (returns a list of evaluated elements)
-        return [self.evaluate(child) for child in node.children]
+        # Evaluate an array (a packed NumArray of numbers, or a list)
+        return make_array([self.evaluate(child) for child in node.children])
+
+    def profiled_evaluate(self, node):
+        self.profiler.enter_node()
+        try:
+            return Interpreter.evaluate(self, node)
+        finally:
+            self.profiler.exit_node(node)
+
+    def profiled_call_function(self, info, args):
+        self.profiler.enter_call(info.name)
+        try:
+            return Interpreter.call_function(self, info, args)
+        finally:
+            self.profiler.exit_call()
@@ -1,9 +1,15 @@
+import codecs
 import re
 
 # Define token types with an even broader set of symbols, keywords, and advanced constructs
 TOKEN_TYPES = [
+    # Layout (dropped from the token stream)
+    ("NEWLINE", r"\n"),  # Line break
+    ("SKIP", r"[ \t\r\f\v]+"),  # Whitespace
+    ("COMMENT", r"//[^\n]*"),  # Line comment
+
     # Basic Types and Operators
-    ("NUMBER", r"\d+(\.\d*)?"),  # Integer or floating point number
+    ("NUMBER", r"\d+(\.\d*)?"),  # Integer or floating point number (see number_value)
     ("STRING", r'"[^"\\]*(\\.[^"\\]*)*"'),  # String literals with escape sequences
     ("ID", r"[a-zA-Z_][a-zA-Z0-9_]*"),  # Identifiers (variable names, function names)
     ("ASSIGN", r"="),  # Assignment operator
@@ -45,6 +51,7 @@ TOKEN_TYPES = [
     ("BREAK", r"\bbreak\b"),  # Break keyword
     ("CONTINUE", r"\bcontinue\b"),  # Continue keyword
     ("RETURN", r"\breturn\b"),  # Return keyword
+    ("DEF", r"\bdef\b"),  # Function definition keyword
     ("THROW", r"\bthrow\b"),  # Throw an exception
     ("TRY", r"\btry\b"),  # Try block for exception handling
     ("CATCH", r"\bcatch\b"),  # Catch block for exceptions
@@ -110,24 +117,171 @@ TOKEN_TYPES = [
     ("MISMATCH", r"."),  # Any other character
 ]
 
-# Function to tokenize input code
-def tokenize(code):
-    tokens = []
+# Token types that are matched but never emitted
+SKIPPED_TOKENS = {"SKIP", "NEWLINE", "COMMENT"}
+
+# Compound literal patterns overlap the punctuation the parser is built on
+# ("{", "[", "/" and identifiers) and could never win a match in the original
+# first-match loop, so they are left out of the master pattern.
+SHADOWED_TOKENS = {"OBJECT", "ARRAY_LITERAL", "FUNCTION_LITERAL", "INLINE_FUNCTION", "REGEX_LITERAL"}
+
+_KEYWORD_PATTERN = re.compile(r"\\b(\w+)\\b")
+_UNESCAPED_META = re.compile(r"(?<!\\)[.^$*+?{}\[\]|()]")
+
+
+def _literal(pattern):
+    # Return the fixed string a pattern matches, or None if it is a real regex
+    if _UNESCAPED_META.search(pattern):
+        return None
+    text = re.sub(r"\\(.)", r"\1", pattern)
+    return text if re.fullmatch(pattern, text) else None
+
+
+def _build_master_pattern():
+    # Keywords are recognised through the ID rule and a table lookup, and fixed
+    # operators are tried longest first so "==", "<=", "++" and "->" win over
+    # their one-character prefixes. Everything else keeps its TOKEN_TYPES order,
+    # with the MISMATCH catch-all last.
+    keywords = {}
+    operators = []
+    rules = []
+    for token_type, pattern in TOKEN_TYPES:
+        if token_type in SHADOWED_TOKENS:
+            continue
+        if token_type == "MISMATCH":
+            fallback = pattern
+            continue
+        keyword = _KEYWORD_PATTERN.fullmatch(pattern)
+        if keyword:
+            keywords[keyword.group(1)] = token_type
+            continue
+        literal = _literal(pattern)
+        if literal is not None:
+            operators.append((token_type, literal))
+        else:
+            rules.append((token_type, pattern))
+    operators.sort(key=lambda operator: len(operator[1]), reverse=True)
+    rules += [(token_type, re.escape(literal)) for token_type, literal in operators]
+    rules.append(("MISMATCH", fallback))
+    master = "|".join(f"(?P<{token_type}>{pattern})" for token_type, pattern in rules)
+    return re.compile(master), keywords
+
+
+# Single alternation over every token type, compiled once at import time
+MASTER_PATTERN, KEYWORDS = _build_master_pattern()
+
+
+# Characters requested from file objects per read while streaming
+CHUNK_SIZE = 1 << 16
+
+
+def _text_reader(source):
+    # Return a read(size) function producing text from a text or binary file
+    # object or an mmap; it returns "" once the source is exhausted
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read_file(size):
+        while True:
+            data = source.read(size)
+            if isinstance(data, str):
+                return data
+            text = decoder.decode(data, final=not data)
+            if text or not data:
+                return text
+    return read_file
+
+
+# Generator yielding (type, text, line, column) tokens lazily
+def iter_tokens(source, chunk_size=CHUNK_SIZE):
+    if isinstance(source, str):
+        read = None
+        buffer = source
+    else:
+        read = _text_reader(source)
+        buffer = ""
     line_number = 1
-    position = 0
-    while position < len(code):
-        match = None
-        for token_type, pattern in TOKEN_TYPES:
-            regex = re.compile(pattern)
-            match = regex.match(code, position)
-            if match:
-                text = match.group(0)
-                if token_type != "SKIP" and token_type != "COMMENT":  # Ignore whitespaces and comments
-                    tokens.append((token_type, text, line_number))
-                position += len(text)
-                if token_type == "NEWLINE":
-                    line_number += 1
+    line_start = 0  # Offset of the current line's first character within buffer
+    read_size = chunk_size
+    at_eof = read is None
+    while True:
+        if not at_eof:
+            chunk = read(read_size)
+            at_eof = not chunk
+            buffer = buffer + chunk if buffer else chunk
+        # A token touching the end of the buffer, or a quote that might open a
+        # string, may continue in the next chunk: stop there and rescan it later
+        partial = not at_eof
+        end = len(buffer)
+        position = end
+        for match in MASTER_PATTERN.finditer(buffer):
+            token_type = match.lastgroup
+            if token_type == "SKIP":
+                if partial and match.end() == end:
+                    position = match.start()
+                    break
+                continue
+            if token_type == "NEWLINE":
+                line_number += 1
+                line_start = match.end()
+                continue
+            text = match.group()
+            start = match.start()
+            if partial and (start + len(text) == end or text == '"'):
+                position = start
                 break
-        if not match:
-            raise SyntaxError(f"Unexpected character: {code[position]}")
-    return tokens
+            if token_type == "COMMENT":
+                continue
+            if token_type == "ID":
+                token_type = KEYWORDS.get(text, "ID")
+            elif token_type == "STRING" and "\n" in text:
+                yield (token_type, text, line_number, start - line_start + 1)
+                line_number += text.count("\n")
+                line_start = start + text.rindex("\n") + 1
+                continue
+            yield (token_type, text, line_number, start - line_start + 1)
+        if at_eof:
+            return
+        # Grow the read size while a single token is still incomplete so that a
+        # long string is not rescanned once per chunk
+        read_size = read_size * 2 if position == 0 else chunk_size
+        buffer = buffer[position:]
+        line_start -= position
+
+
+# Generator over the tokens of a string from `position` on, which must be
+# the start of a token (or of the text), at the given line whose first
+# character is at `line_start`. Yields (token, start offset) pairs with the
+# same tokens iter_tokens produces; incremental.py rescans edits with it
+def scan_tokens(text, position=0, line_number=1, line_start=0):
+    for match in MASTER_PATTERN.finditer(text, position):
+        token_type = match.lastgroup
+        if token_type == "SKIP" or token_type == "COMMENT":
+            continue
+        if token_type == "NEWLINE":
+            line_number += 1
+            line_start = match.end()
+            continue
+        token_text = match.group()
+        start = match.start()
+        if token_type == "ID":
+            token_type = KEYWORDS.get(token_text, "ID")
+        yield (token_type, token_text, line_number, start - line_start + 1), start
+        if token_type == "STRING" and "\n" in token_text:
+            line_number += token_text.count("\n")
+            line_start = start + token_text.rindex("\n") + 1
+
+
+# Value of a NUMBER literal: an exact int unless it has a decimal point
+def number_value(text):
+    if "." in text:
+        return float(text)
+    try:
+        return int(text)
+    except ValueError:
+        # More digits than int() converts (sys.get_int_max_str_digits())
+        return float(text)
+
+
+# Function to tokenize input code
+def tokenize(code):
+    return list(iter_tokens(code))
@@ -1,36 +1,84 @@
 # main.py
 
-# Assuming the Interpreter and ASTNode classes are in the same directory
-# or already imported from another module.
+import argparse
+import os
+import time
+
+from astcache import DEFAULT_CACHE_DIR, ProgramCache
+from astnode import ASTNode
+from interpreter import BACKENDS, Interpreter
+
+# Run a script file, loading its AST through the on-disk cache
+def run_script(args):
+    cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(args.script)), DEFAULT_CACHE_DIR)
+    cache = ProgramCache(cache_dir)
+    with open(args.script, encoding="utf-8") as handle:
+        source = handle.read()
+    if args.no_cache:
+        program = cache.parse(source, args.opt_level)
+    else:
+        program = cache.load(source, args.opt_level)
+    timings = dict(cache.timings)
+
+    # The program is already optimized at the requested level
+    interpreter = Interpreter(backend=args.backend, profile=args.profile)
+    start = time.perf_counter()
+    result = interpreter.run(program)
+    timings["run"] = time.perf_counter() - start
+    print(result)
+    if args.timing:
+        state = "warm" if cache.hits else "cold"
+        phases = ", ".join(f"{phase} {seconds * 1000:.2f} ms" for phase, seconds in timings.items())
+        print(f"[{state} start] {phases}")
+    report_profile(interpreter, args)
+
+
+# Print the profile report and write the collapsed stacks if requested
+def report_profile(interpreter, args):
+    if interpreter.profiler is None:
+        return
+    print()
+    print(interpreter.profiler.report())
+    if args.collapsed:
+        with open(args.collapsed, "w", encoding="utf-8") as handle:
+            handle.write(interpreter.profiler.collapsed())
 
-class ASTNode:
-    def __init__(self, node_type, value=None, left=None, right=None, children=None):
-        self.type = node_type
-        self.value = value
-        self.left = left
-        self.right = right
-        self.children = children if children else []
 
 # Main code to test the Interpreter class
 def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("script", nargs="?", help="script to run instead of the built-in examples")
+    arg_parser.add_argument("--backend", choices=BACKENDS, default="tree", help="execution backend")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, default=0, help="optimizer level (0-3)")
+    arg_parser.add_argument("--cache-dir", help=f"AST cache directory (default: {DEFAULT_CACHE_DIR} next to the script)")
+    arg_parser.add_argument("--no-cache", action="store_true", help="always lex and parse the script")
+    arg_parser.add_argument("--timing", action="store_true", help="print cold/warm start timings")
+    arg_parser.add_argument("--profile", action="store_true", help="profile the run (tree backend) and print a report")
+    arg_parser.add_argument("--collapsed", help="with --profile, write collapsed stacks for flame graphs to this file")
+    args = arg_parser.parse_args()
+
+    if args.script:
+        run_script(args)
+        return
+
     # Create an instance of the Interpreter class
-    interpreter = Interpreter()
+    interpreter = Interpreter(backend=args.backend, opt_level=args.opt_level, profile=args.profile)
 
     # Test: Variable assignment
     print("Testing Variable Assignment:")
     var_assign_node = ASTNode("ASSIGN", left=ASTNode("ID", value="x"), right=ASTNode("NUMBER", value="10"))
-    interpreter.evaluate(var_assign_node)  # Assign x = 10
-    print(f"Value of x: {interpreter.variables['x']}")  # Should output 10.0
+    interpreter.run(var_assign_node)  # Assign x = 10
+    print(f"Value of x: {interpreter.variables['x']}")  # Should output 10
 
     # Test: Simple arithmetic operations
     print("\nTesting Arithmetic Operations:")
     add_node = ASTNode("ADD", left=ASTNode("NUMBER", value="5"), right=ASTNode("NUMBER", value="3"))
-    result = interpreter.evaluate(add_node)
-    print(f"5 + 3 = {result}")  # Should output 8.0
+    result = interpreter.run(add_node)
+    print(f"5 + 3 = {result}")  # Should output 8
 
     sub_node = ASTNode("SUB", left=ASTNode("NUMBER", value="10"), right=ASTNode("NUMBER", value="4"))
-    result = interpreter.evaluate(sub_node)
-    print(f"10 - 4 = {result}")  # Should output 6.0
+    result = interpreter.run(sub_node)
+    print(f"10 - 4 = {result}")  # Should output 6
 
     # Test: Function definition and calling
     print("\nTesting Function Definition and Call:")
@@ -43,11 +91,11 @@ def main():
     func_call_node = ASTNode("FUNC_CALL", value="square", children=[ASTNode("NUMBER", value="5")])
 
     # Define the function
-    interpreter.evaluate(func_node)
+    interpreter.run(func_node)
 
     # Call the function and get the result
-    result = interpreter.evaluate(func_call_node)
-    print(f"square(5) = {result}")  # Should output 25.0
+    result = interpreter.run(func_call_node)
+    print(f"square(5) = {result}")  # Should output 25
 
     # Test: Conditional (IF) statement
     print("\nTesting IF statement:")
@@ -56,8 +104,8 @@ def main():
         ASTNode("ASSIGN", left=ASTNode("ID", value="y"), right=ASTNode("NUMBER", value="100")),
         ASTNode("ASSIGN", left=ASTNode("ID", value="y"), right=ASTNode("NUMBER", value="200"))
     ])
-    interpreter.evaluate(if_node)
-    print(f"Value of y (if condition True): {interpreter.variables['y']}")  # Should output 100.0
+    interpreter.run(if_node)
+    print(f"Value of y (if condition True): {interpreter.variables['y']}")  # Should output 100
 
     # Test: Array handling
     print("\nTesting Array Handling:")
@@ -66,8 +114,10 @@ def main():
         ASTNode("NUMBER", value="2"),
         ASTNode("NUMBER", value="3")
     ])
-    result = interpreter.evaluate(array_node)
+    result = interpreter.run(array_node)
     print(f"Array [1, 2, 3]: {result}")  # Should output [1.0, 2.0, 3.0]
 
+    report_profile(interpreter, args)
+
 if __name__ == "__main__":
     main()
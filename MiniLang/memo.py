@@ -0,0 +1,213 @@
+# Memoization of calls to pure user functions.
+#
+# A function is pure when its result depends only on its arguments: after
+# resolution its body reads no globals (including locals that may be read
+# before they are assigned, which start from the global of the same name),
+# builds no arrays, defines no functions and calls only pure functions.
+# Results are kept in one LRU table keyed by the FUNC_DEF node and the
+# argument values.
+
+from collections import OrderedDict
+
+from resolver import FunctionInfo
+
+# Returned by Memoizer.lookup on a miss (None is a valid cached result)
+MISSING = object()
+
+# Steps of PurityChecker.run
+CHECK = 0  # Check a node
+BLOCK = 1  # Check the statements of a block in order
+ASSIGNED = 2  # Add a local slot to the assigned set
+LOOP = 3  # Run the given steps, then go back to the assigned set from before them
+BRANCH = 4  # Check an IF's body, then its else branch from the same assigned set
+ELSE = 5  # Check the else branch and keep what both branches assign
+MEET = 6  # Intersect the assigned set with the given one
+
+
+class Memoizer:
+    def __init__(self, maxsize, pure_functions=()):
+        self.maxsize = maxsize
+        self.pure_functions = set(pure_functions)  # Names declared pure by the caller
+        self.cache = OrderedDict()  # (FUNC_DEF node, args) -> result
+        self.purity = {}  # id(FUNC_DEF node) -> (node, bool)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.cache),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        # Called when a function is redefined: callers' results and purity may
+        # have depended on the old definition
+        self.cache.clear()
+        self.purity.clear()
+
+    def call(self, func, args, compute):
+        # Return compute() for a call of func with args, from the cache if possible
+        key, result = self.lookup(func, args)
+        if result is not MISSING:
+            return result
+        result = compute()
+        if key is not None:
+            self.store(key, result)
+        return result
+
+    def lookup(self, func, args):
+        # Return (key, cached result or MISSING); key is None for unhashable
+        # arguments such as arrays, whose results are never stored.
+        # Argument types are part of the key, as 1.0 and true compare equal
+        key = (func, tuple(args), tuple(map(type, args)))
+        try:
+            result = self.cache[key]
+        except KeyError:
+            self.misses += 1
+            return key, MISSING
+        except TypeError:
+            return None, MISSING
+        self.hits += 1
+        self.cache.move_to_end(key)
+        return key, result
+
+    def store(self, key, result):
+        self.cache[key] = result
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def chain(self, keys, key):
+        # Add key to the keys of a chain of tail calls, whose results are
+        # stored innermost first when it returns. Only the outermost maxsize
+        # of them would stay cached, so later keys count as evicted at once
+        # instead of being kept until then
+        if len(keys) < self.maxsize:
+            keys.append(key)
+        else:
+            self.evictions += 1
+
+    def is_pure(self, func, functions):
+        entry = self.purity.get(id(func))
+        if entry is None or entry[0] is not func:
+            entry = (func, self.analyze(func, functions, set()))
+            self.purity[id(func)] = entry
+        return entry[1]
+
+    def analyze(self, func, functions, visiting):
+        # func is pure when its body and the bodies of all the functions it
+        # can call pass the checker; a call back into a function already
+        # being checked counts as pure. The functions are checked from a
+        # work list rather than by recursing along the call chain, and
+        # callees whose purity is already known are not checked again
+        pending = [func]
+        checked = []
+        visiting.add(id(func))
+        while pending:
+            func = pending.pop()
+            checked.append(func)
+            if func.value in self.pure_functions:
+                continue
+            callees = []
+            info = FunctionInfo(func)
+            checker = PurityChecker(info, functions, lambda callee: callees.append(callee) is None)
+            if checker.check_block(info.body, set(range(len(info.params)))) is None:
+                return False
+            for callee in callees:
+                if id(callee) in visiting:
+                    continue
+                entry = self.purity.get(id(callee))
+                if entry is not None and entry[0] is callee:
+                    if not entry[1]:
+                        return False
+                    continue
+                visiting.add(id(callee))
+                pending.append(callee)
+        # Everything the checked functions can call passed as well
+        for func in checked:
+            self.purity[id(func)] = (func, True)
+        return True
+
+
+# Walks a resolved body in execution order, tracking the local slots that are
+# definitely assigned; each check returns the updated set, or None as soon as
+# something impure is found. The walk keeps its pending steps on a list, so
+# deeply nested bodies and long expressions do not run into the recursion
+# limit
+class PurityChecker:
+    def __init__(self, info, functions, callee_is_pure):
+        self.info = info
+        self.functions = functions
+        self.callee_is_pure = callee_is_pure
+
+    def check_block(self, block, assigned):
+        return self.run([(BLOCK, block)], assigned)
+
+    def check(self, node, assigned):
+        return self.run([(CHECK, node)], assigned)
+
+    def run(self, steps, assigned):
+        while steps:
+            step, arg = steps.pop()
+            if step == CHECK:
+                node = arg
+                node_type = node.type
+                if node_type in ("NUMBER", "STRING", "BOOLEAN"):
+                    continue
+                if node_type == "LOCAL":
+                    if node.value not in assigned:
+                        return None
+                elif node_type in ("ID", "ARRAY", "FUNC_DEF"):
+                    return None
+                elif node_type == "ASSIGN":
+                    if node.left.type != "LOCAL":
+                        return None
+                    steps.append((ASSIGNED, node.left.value))
+                    steps.append((CHECK, node.right))
+                elif node_type == "FUNC_CALL":
+                    callee = self.functions.get(node.value)
+                    if callee is None or not self.callee_is_pure(callee):
+                        return None
+                    steps.extend((CHECK, child) for child in reversed(node.children))
+                elif node_type == "RETURN":
+                    steps.append((CHECK, node.children[0]))
+                elif node_type == "IF":
+                    steps.append((BRANCH, node))
+                    steps.append((CHECK, node.children[0]))
+                elif node_type == "WHILE":
+                    steps.append((LOOP, [(BLOCK, node.children[1])]))
+                    steps.append((CHECK, node.children[0]))
+                elif node_type == "FOR":
+                    steps.append((LOOP, [(CHECK, node.children[1]), (BLOCK, node.children[3]), (CHECK, node.children[2])]))
+                    steps.append((CHECK, node.children[0]))
+                elif node.left is not None and node.right is not None:
+                    steps.append((CHECK, node.right))
+                    steps.append((CHECK, node.left))
+                else:
+                    return None
+            elif step == BLOCK:
+                block = arg if isinstance(arg, list) else [arg]
+                steps.extend((CHECK, stmt) for stmt in reversed(block))
+            elif step == ASSIGNED:
+                assigned = assigned | {arg}
+            elif step == LOOP:
+                # What a loop body assigns may not have happened
+                steps.append((MEET, assigned))
+                steps.extend(reversed(arg))
+            elif step == BRANCH:
+                else_body = arg.children[2] if len(arg.children) > 2 else None
+                steps.append((ELSE, (assigned, else_body)))
+                steps.append((BLOCK, arg.children[1]))
+            elif step == ELSE:
+                before, else_body = arg
+                steps.append((MEET, assigned))
+                assigned = before
+                if else_body:
+                    steps.append((BLOCK, else_body))
+            else:  # MEET
+                assigned = assigned & arg
+        return assigned
@@ -0,0 +1,295 @@
+# Optional AST optimizer run between Parser and execution.
+#
+# Levels:
+#   0  no changes
+#   1  NUMBER literals still holding their text converted once; arithmetic
+#      and comparison nodes whose operands are all literals folded into a
+#      single literal
+#   2  level 1, plus identities (e * 1, 1 * e, e / 1, e - 0, e ^ 1) where e is
+#      provably a number of a type the identity preserves (any number for an
+#      integer literal, a float for a float literal), IF and WHILE statements
+#      with a literal condition pruned, and statements after a RETURN in the
+#      same block removed
+#   3  level 2, with variables assumed to hold numbers (ints or floats) for
+#      the identities
+#
+# The input tree is never modified; optimize() returns a rebuilt copy.
+
+import copy
+
+from astnode import NO_CHILDREN
+from compiler import BINARY_OPERATORS
+from lexer import number_value
+
+LITERAL_TYPES = ("NUMBER", "STRING", "BOOLEAN")
+
+# Arithmetic nodes that return a float whenever one operand is a float and
+# the operation does not raise. MOD needs a float on the left ("%s" % x
+# formats a string) and POWER is excluded because it can return complex.
+FLOAT_ARITHMETIC = ("ADD", "SUB", "MUL", "DIV")
+
+# Largest integer power folded at compile time, in bits; bigger ones are left
+# to run time rather than computed (and cached) by the optimizer
+MAX_FOLDED_POWER_BITS = 4096
+# Longest string repetition ("ab" * n) folded at compile time, in characters
+MAX_FOLDED_REPEAT_LENGTH = 4096
+
+# Steps of the rebuilding walk in Optimizer.rebuild
+NODE = 0  # Optimize a node (or pass through a non-node) and push the result
+BLOCK = 1  # Optimize a block (or a single node standing for one) and push the result
+NEXT_STATEMENT = 2  # Take the last optimized statement of a block and go on to the next
+FINISH_NODE = 3  # Pop the node's optimized parts into it, fold it and push it
+FINISH_DEF = 4  # Pop a FUNC_DEF's optimized body into it and push it
+
+
+class OptimizationReport:
+    def __init__(self):
+        self.nodes_before = 0
+        self.nodes_after = 0
+        self.folded = 0  # Operator nodes replaced by a literal
+        self.simplified = 0  # Identities removed
+        self.pruned = 0  # IF/WHILE statements resolved at compile time
+        self.dead = 0  # Unreachable statements removed after RETURN
+
+    @property
+    def eliminated(self):
+        return self.nodes_before - self.nodes_after
+
+    def __str__(self):
+        return (
+            f"nodes: {self.nodes_before} -> {self.nodes_after} ({self.eliminated} eliminated); "
+            f"folded {self.folded}, simplified {self.simplified}, "
+            f"pruned {self.pruned}, dead {self.dead}"
+        )
+
+
+def count_nodes(tree):
+    count = 0
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif hasattr(item, "type"):
+            count += 1
+            stack.append(item.left)
+            stack.append(item.right)
+            stack.extend(item.children)
+    return count
+
+
+def literal_value(node):
+    # The runtime value of a literal node, as the tree walker computes it
+    if node.type == "NUMBER" and type(node.value) is str:
+        return number_value(node.value)
+    return node.value
+
+
+def power_too_large(base, exponent):
+    # Whether base ** exponent is an integer of more than MAX_FOLDED_POWER_BITS
+    if type(base) is not int or type(exponent) is not int or exponent <= 0 or abs(base) <= 1:
+        return False
+    return exponent * (abs(base).bit_length() - 1) > MAX_FOLDED_POWER_BITS
+
+
+def repeat_too_large(left, right):
+    # Whether left * right repeats a string to more than MAX_FOLDED_REPEAT_LENGTH
+    if isinstance(right, str):
+        left, right = right, left
+    return isinstance(left, str) and isinstance(right, int) and len(left) * right > MAX_FOLDED_REPEAT_LENGTH
+
+
+class Optimizer:
+    def __init__(self, level=1):
+        self.level = level
+        self.report = OptimizationReport()
+
+    def optimize(self, program):
+        # Accepts a node or a statement list, like Interpreter.run
+        self.report = OptimizationReport()
+        self.report.nodes_before = count_nodes(program)
+        if self.level <= 0:
+            result = program
+        elif isinstance(program, list):
+            result = self.optimize_block(program)
+        else:
+            result = self.optimize_node(program)
+        self.report.nodes_after = count_nodes(result)
+        return result
+
+    def optimize_block(self, block):
+        return self.rebuild(BLOCK, block)
+
+    def optimize_node(self, node):
+        return self.rebuild(NODE, node)
+
+    def rebuild(self, step, item):
+        # Optimized copy of a node or block, built bottom-up with explicit
+        # step and result stacks so that long operator chains and deep
+        # nesting do not run into the recursion limit
+        steps = [(step, item)]
+        results = []
+        while steps:
+            step, item = steps.pop()
+            if step == NODE:
+                if not hasattr(item, "type"):
+                    results.append(item)
+                    continue
+                node = copy.copy(item)
+                if node.type == "NUMBER":
+                    node.value = literal_value(node)
+                    results.append(node)
+                elif node.type == "FUNC_DEF":
+                    steps.append((FINISH_DEF, node))
+                    steps.append((BLOCK, node.children[-1]))
+                else:
+                    steps.append((FINISH_NODE, node))
+                    for child in reversed(node.children):
+                        steps.append((BLOCK if isinstance(child, list) else NODE, child))
+                    steps.append((NODE, node.right))
+                    steps.append((NODE, node.left))
+            elif step == BLOCK:
+                if isinstance(item, list):
+                    steps.append((NEXT_STATEMENT, (item, 0, [])))
+                else:
+                    steps.append((NODE, item))
+            elif step == NEXT_STATEMENT:
+                block, index, result = item
+                if index > 0 and self.add_statement(block, index - 1, results.pop(), result):
+                    index = len(block)  # The rest follows a RETURN
+                if index < len(block):
+                    steps.append((NEXT_STATEMENT, (block, index + 1, result)))
+                    steps.append((NODE, block[index]))
+                else:
+                    results.append(result)
+            elif step == FINISH_NODE:
+                node = item
+                if node.children:
+                    count = len(node.children)
+                    node.children = results[len(results) - count:]
+                    del results[len(results) - count:]
+                node.right = results.pop()
+                node.left = results.pop()
+                results.append(self.fold(node) if node.type in BINARY_OPERATORS else node)
+            else:  # FINISH_DEF
+                node = item
+                node.children = node.children[:-1] + [results.pop()]
+                results.append(node)
+        return results[0]
+
+    def add_statement(self, block, index, stmt, result):
+        # Append the optimized block[index] to result, pruned at level 2;
+        # return True when it ends in a RETURN that makes the rest dead
+        last = index == len(block) - 1
+        replacement = self.prune(stmt, last) if self.level >= 2 else None
+        if replacement is None:
+            result.append(stmt)
+        else:
+            self.report.pruned += 1
+            result.extend(replacement)
+        if self.level >= 2 and result and getattr(result[-1], "type", None) == "RETURN":
+            self.report.dead += len(block) - index - 1
+            return True
+        return False
+
+    def prune(self, stmt, last):
+        # Statements to splice in place of an IF or WHILE with a literal
+        # condition, or None to keep stmt. A block's value is that of its last
+        # statement, so a last statement is only replaced by a non-empty body.
+        if stmt.type == "IF" and stmt.children[0].type in LITERAL_TYPES:
+            branch = stmt.children[1] if literal_value(stmt.children[0]) else (stmt.children[2:] or [None])[0]
+            branch = [] if branch is None else branch if isinstance(branch, list) else [branch]
+            if branch or not last:
+                return branch
+        elif stmt.type == "WHILE" and stmt.children[0].type in LITERAL_TYPES:
+            if not literal_value(stmt.children[0]) and not last:
+                return []
+        return None
+
+    def fold(self, node):
+        left, right = node.left, node.right
+        if left.type in LITERAL_TYPES and right.type in LITERAL_TYPES:
+            left_value, right_value = literal_value(left), literal_value(right)
+            if node.type == "POWER" and power_too_large(left_value, right_value):
+                return node
+            if node.type == "MUL" and repeat_too_large(left_value, right_value):
+                return node
+            try:
+                value = BINARY_OPERATORS[node.type](left_value, right_value)
+            except (ArithmeticError, TypeError, ValueError):
+                return node  # Leave the error to be raised at run time
+            # Only fold when the new literal evaluates to exactly this value
+            literal_type = {int: "NUMBER", float: "NUMBER", bool: "BOOLEAN", str: "STRING"}.get(type(value))
+            if literal_type is None:
+                return node
+            folded = copy.copy(left)
+            folded.type = literal_type
+            folded.value = value
+            folded.left = folded.right = None
+            folded.children = NO_CHILDREN
+            self.report.folded += 1
+            return folded
+        if self.level >= 2:
+            simplified = self.simplify(node)
+            if simplified is not node:
+                self.report.simplified += 1
+            return simplified
+        return node
+
+    def simplify(self, node):
+        left, right = node.left, node.right
+        if node.type in ("MUL", "DIV", "POWER") and self.is_number(right, 1) and self.keeps_type(left, right):
+            # e / 1 is a float even for an integer e
+            if node.type != "DIV" or self.is_float(left):
+                return left
+        if node.type == "MUL" and self.is_number(left, 1) and self.keeps_type(right, left):
+            return right
+        # e + 0 is not an identity for e == -0.0, but e - 0 is
+        if node.type == "SUB" and self.is_number(right, 0) and self.keeps_type(left, right):
+            return left
+        return node
+
+    def is_number(self, node, value):
+        return node.type == "NUMBER" and node.value == value
+
+    def keeps_type(self, node, literal):
+        # Whether combining node with the NUMBER literal leaves node's type:
+        # an integer literal keeps any number, a float literal only a float
+        if type(literal.value) is int:
+            return self.is_numeric(node)
+        return self.is_float(node)
+
+    def is_numeric(self, node):
+        # Whether node provably evaluates to an int or a float (or raises):
+        # a float, or arithmetic whose operands are all numeric. Booleans are
+        # excluded: true * 1 is 1
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if node.type == "NUMBER" or (node.type in ("ID", "LOCAL") and self.level >= 3):
+                continue
+            if node.type not in FLOAT_ARITHMETIC and node.type != "MOD":
+                return False
+            if not self.is_float(node):
+                pending.append(node.right)
+                pending.append(node.left)
+        return True
+
+    def is_float(self, node):
+        # Whether node provably evaluates to a float (or raises): a float
+        # literal or a division reached through the operands of arithmetic,
+        # only the left one of MOD
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if node.type == "NUMBER":
+                if type(node.value) is float:
+                    return True
+            elif node.type == "DIV":
+                return True
+            elif node.type in FLOAT_ARITHMETIC:
+                pending.append(node.right)
+                pending.append(node.left)
+            elif node.type == "MOD":
+                pending.append(node.left)
+        return False
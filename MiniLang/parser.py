@@ -1,26 +1,101 @@
-class ASTNode:
-    def __init__(self, type_, value=None, left=None, right=None, children=None):
-        self.type = type_
-        self.value = value
-        self.left = left
-        self.right = right
-        self.children = children if children else []
+from astnode import ASTNode, building_tree
+from lexer import number_value
+
+# Binary operator tokens -> (left binding power, right binding power, node
+# type, node value). Every operator is left-associative (right power above
+# the left one) except assignment, which binds to the right.
+BINARY_OPERATORS = {
+    "ASSIGN": (2, 1, "ASSIGN", None),
+    "OR": (3, 4, "OR", None),
+    "AND": (5, 6, "AND", None),
+    "EQ": (7, 8, "EQ", None),
+    "NEQ": (7, 8, "NEQ", None),
+    "LT": (7, 8, "LT", None),
+    "LEQ": (7, 8, "LEQ", None),
+    "GT": (7, 8, "GT", None),
+    "GEQ": (7, 8, "GEQ", None),
+    "PLUS": (9, 10, "ADD", "+"),
+    "MINUS": (9, 10, "SUB", "-"),
+    "TIMES": (11, 12, "MUL", "*"),
+    "DIVIDE": (11, 12, "DIV", "/"),
+    "MOD": (11, 12, "MOD", "%"),
+    "POWER": (11, 12, "POWER", "^"),
+}
+COMPOUND_STATEMENTS = ("IF", "WHILE", "FOR", "DEF")
+
+# Cursor over a token list or a lazy token iterator. Tokens are buffered only
+# as far ahead as peek() has looked; consumed tokens of an iterator source are
+# dropped from the buffer unless a mark still needs them for reset()
+class TokenStream:
+    TRIM_THRESHOLD = 4096
+
+    def __init__(self, tokens):
+        if isinstance(tokens, list):
+            self.buffer = tokens
+            self.source = None
+        else:
+            self.buffer = []
+            self.source = iter(tokens)
+        self.index = 0
+        self.marks = []
+
+    def peek(self, n=0):
+        # Return the token n positions past the cursor, or None past the end
+        index = self.index + n
+        buffer = self.buffer
+        while index >= len(buffer) and self.source is not None:
+            token = next(self.source, None)
+            if token is None:
+                self.source = None
+            else:
+                buffer.append(token)
+        return buffer[index] if index < len(buffer) else None
+
+    def advance(self):
+        token = self.peek()
+        if token is not None:
+            self.index += 1
+            if self.index >= self.TRIM_THRESHOLD and not self.marks and self.source is not None:
+                del self.buffer[:self.index]
+                self.index = 0
+        return token
+
+    def mark(self):
+        # Remember the cursor so that a later reset() can backtrack to it
+        self.marks.append(self.index)
+
+    def reset(self):
+        self.index = self.marks.pop()
+
+    def release(self):
+        # Drop the innermost mark without moving the cursor
+        self.marks.pop()
 
-    def __repr__(self):
-        return f"{self.type}({self.value})"
 
 # Parser class with expanded grammar
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.current_token = None
-        self.next_token()
+        # Accepts a token list or a lazy iterator such as lexer.iter_tokens
+        self.stream = TokenStream(tokens)
+        self.current_token = self.stream.peek()
 
     def next_token(self):
-        if len(self.tokens) > 0:
-            self.current_token = self.tokens.pop(0)
-        else:
-            self.current_token = None
+        self.stream.advance()
+        self.current_token = self.stream.peek()
+
+    def peek(self, n=1):
+        # Look n tokens past the current one without consuming anything
+        return self.stream.peek(n)
+
+    def mark(self):
+        self.stream.mark()
+
+    def reset(self):
+        self.stream.reset()
+        self.current_token = self.stream.peek()
+
+    def release(self):
+        self.stream.release()
 
     def eat(self, token_type):
         if self.current_token and self.current_token[0] == token_type:
@@ -28,203 +103,212 @@ class Parser:
         else:
             raise SyntaxError(f"Expected {token_type}, but got {self.current_token}")
 
-    # Grammar rule for expressions (including logical and comparison operators)
+    # Expressions are parsed by precedence climbing (Pratt style) over explicit
+    # operand and operator stacks. Parentheses, array literals and call
+    # arguments push a group instead of recursing, so neither long operator
+    # chains nor deep nesting touch the Python stack.
     def parse_expression(self):
-        return self.parse_assignment()
-
-    def parse_assignment(self):
-        node = self.parse_logic_or()
-        if self.current_token and self.current_token[0] == "ASSIGN":
-            self.eat("ASSIGN")
-            node = ASTNode("ASSIGN", left=node, right=self.parse_expression())
-        return node
-
-    def parse_logic_or(self):
-        node = self.parse_logic_and()
-        while self.current_token and self.current_token[0] == "OR":
-            self.eat("OR")
-            node = ASTNode("OR", left=node, right=self.parse_logic_and())
-        return node
-
-    def parse_logic_and(self):
-        node = self.parse_comparison()
-        while self.current_token and self.current_token[0] == "AND":
-            self.eat("AND")
-            node = ASTNode("AND", left=node, right=self.parse_comparison())
-        return node
-
-    def parse_comparison(self):
-        node = self.parse_term()
-        while self.current_token and self.current_token[0] in ("EQ", "NEQ", "LT", "LEQ", "GT", "GEQ"):
+        operands = []
+        operators = []  # (left power, right power, node type, value)
+        groups = []  # (opening token type or "CALL", elements, first token, outer base)
+        base = 0
+        while True:
+            # Operand position: a literal, a name, a call or an opening group
             token = self.current_token
-            if token[0] == "EQ":
-                self.eat("EQ")
-                node = ASTNode("EQ", left=node, right=self.parse_term())
-            elif token[0] == "NEQ":
-                self.eat("NEQ")
-                node = ASTNode("NEQ", left=node, right=self.parse_term())
-            elif token[0] == "LT":
-                self.eat("LT")
-                node = ASTNode("LT", left=node, right=self.parse_term())
-            elif token[0] == "LEQ":
-                self.eat("LEQ")
-                node = ASTNode("LEQ", left=node, right=self.parse_term())
-            elif token[0] == "GT":
-                self.eat("GT")
-                node = ASTNode("GT", left=node, right=self.parse_term())
-            elif token[0] == "GEQ":
-                self.eat("GEQ")
-                node = ASTNode("GEQ", left=node, right=self.parse_term())
-        return node
-
-    def parse_term(self):
-        node = self.parse_factor()
-        while self.current_token and self.current_token[0] in ("PLUS", "MINUS"):
-            token = self.current_token
-            if token[0] == "PLUS":
-                self.eat("PLUS")
-                node = ASTNode("ADD", value="+", left=node, right=self.parse_factor())
-            elif token[0] == "MINUS":
-                self.eat("MINUS")
-                node = ASTNode("SUB", value="-", left=node, right=self.parse_factor())
-        return node
-
-    def parse_factor(self):
-        node = self.parse_primary()
-        while self.current_token and self.current_token[0] in ("TIMES", "DIVIDE", "MOD", "POWER"):
-            token = self.current_token
-            if token[0] == "TIMES":
-                self.eat("TIMES")
-                node = ASTNode("MUL", value="*", left=node, right=self.parse_primary())
-            elif token[0] == "DIVIDE":
-                self.eat("DIVIDE")
-                node = ASTNode("DIV", value="/", left=node, right=self.parse_primary())
-            elif token[0] == "MOD":
-                self.eat("MOD")
-                node = ASTNode("MOD", value="%", left=node, right=self.parse_primary())
-            elif token[0] == "POWER":
-                self.eat("POWER")
-                node = ASTNode("POWER", value="^", left=node, right=self.parse_primary())
-        return node
+            if token is None:
+                raise SyntaxError(f"Unexpected token: {token}")
+            kind = token[0]
+            if kind == "LPAREN" or kind == "LBRACKET":
+                self.next_token()
+                if kind == "LBRACKET" and self.current_token and self.current_token[0] == "RBRACKET":
+                    self.next_token()
+                    operands.append(ASTNode("ARRAY", children=[], line=token[2]))
+                else:
+                    groups.append((kind, [], token, base))
+                    base = len(operators)
+                    continue
+            elif kind == "ID" and self.is_call():
+                self.next_token()
+                self.next_token()
+                if self.current_token and self.current_token[0] == "RPAREN":
+                    self.next_token()
+                    operands.append(ASTNode("FUNC_CALL", value=token[1], children=[], line=token[2]))
+                else:
+                    groups.append(("CALL", [], token, base))
+                    base = len(operators)
+                    continue
+            else:
+                operands.append(self.parse_primary())
+
+            # Operator position: shift a binary operator, or close the
+            # innermost group once its expression has ended
+            while True:
+                token = self.current_token
+                operator = BINARY_OPERATORS.get(token[0]) if token else None
+                if operator is not None:
+                    while len(operators) > base and operators[-1][1] > operator[0]:
+                        self.reduce(operands, operators)
+                    operators.append(operator)
+                    self.next_token()
+                    break
+                while len(operators) > base:
+                    self.reduce(operands, operators)
+                if not groups:
+                    return operands.pop()
+                group = groups[-1]
+                if group[0] == "LPAREN":
+                    self.eat("RPAREN")
+                    groups.pop()
+                    base = group[3]
+                    continue
+                # Array elements and call arguments: commas are optional
+                group[1].append(operands.pop())
+                if self.current_token and self.current_token[0] == "COMMA":
+                    self.eat("COMMA")
+                closing = "RBRACKET" if group[0] == "LBRACKET" else "RPAREN"
+                if self.current_token is None or self.current_token[0] == closing:
+                    self.eat(closing)
+                    groups.pop()
+                    base = group[3]
+                    first = group[2]
+                    if group[0] == "LBRACKET":
+                        operands.append(ASTNode("ARRAY", children=group[1], line=first[2]))
+                    else:
+                        operands.append(ASTNode("FUNC_CALL", value=first[1], children=group[1], line=first[2]))
+                    continue
+                break
+
+    def is_call(self):
+        # Whether the current ID token starts a function call
+        next_token = self.peek()
+        return next_token is not None and next_token[0] == "LPAREN"
+
+    def reduce(self, operands, operators):
+        _, _, node_type, value = operators.pop()
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(ASTNode(node_type, value=value, left=left, right=right, line=left.line))
 
     def parse_primary(self):
         token = self.current_token
         if token[0] == "NUMBER":
             self.eat("NUMBER")
-            return ASTNode("NUMBER", value=token[1])
+            return ASTNode("NUMBER", value=number_value(token[1]), line=token[2])
         elif token[0] == "STRING":
             self.eat("STRING")
-            return ASTNode("STRING", value=token[1][1:-1])  # Remove the quotes
+            return ASTNode("STRING", value=token[1][1:-1], line=token[2])  # Remove the quotes
         elif token[0] == "TRUE":
             self.eat("TRUE")
-            return ASTNode("BOOLEAN", value=True)
+            return ASTNode("BOOLEAN", value=True, line=token[2])
         elif token[0] == "FALSE":
             self.eat("FALSE")
-            return ASTNode("BOOLEAN", value=False)
+            return ASTNode("BOOLEAN", value=False, line=token[2])
         elif token[0] == "ID":
             self.eat("ID")
-            return ASTNode("ID", value=token[1])
-        elif token[0] == "LPAREN":
-            self.eat("LPAREN")
-            node = self.parse_expression()
-            self.eat("RPAREN")
-            return node
-        elif token[0] == "LBRACKET":
-            self.eat("LBRACKET")
-            elements = []
-            while self.current_token and self.current_token[0] != "RBRACKET":
-                elements.append(self.parse_expression())
-                if self.current_token and self.current_token[0] == "COMMA":
-                    self.eat("COMMA")
-            self.eat("RBRACKET")
-            return ASTNode("ARRAY", children=elements)
+            return ASTNode("ID", value=token[1], line=token[2])
         else:
             raise SyntaxError(f"Unexpected token: {token}")
 
-    # Parsing block statements (e.g., if, while)
+    # Statements are parsed in a loop with an explicit stack of the compound
+    # statements (if, while, for, def) whose bodies are still open
     def parse_block(self):
-        statements = []
-        while self.current_token and self.current_token[0] != "RBRACE":
-            statements.append(self.parse_statement())
+        return self.parse_statements()
+
+    # Parsing a whole program
+    def parse_program(self):
+        with building_tree():
+            statements = self.parse_block()
+        if self.current_token:
+            raise SyntaxError(f"Unexpected token: {self.current_token}")
         return statements
 
-    # Parsing a full statement
+    # Parsing a full statement, with an optional trailing semicolon
     def parse_statement(self):
-        if self.current_token[0] == "IF":
-            return self.parse_if()
-        elif self.current_token[0] == "WHILE":
-            return self.parse_while()
-        elif self.current_token[0] == "FOR":
-            return self.parse_for()
-        elif self.current_token[0] == "DEF":
-            return self.parse_function_def()
-        elif self.current_token[0] == "RETURN":
-            return self.parse_return()
-        else:
-            return self.parse_expression()
-
-    # Parsing an if statement
-    def parse_if(self):
-        self.eat("IF")
-        self.eat("LPAREN")
-        condition = self.parse_expression()
-        self.eat("RPAREN")
-        self.eat("LBRACE")
-        body = self.parse_block()
-        self.eat("RBRACE")
-        else_body = None
-        if self.current_token and self.current_token[0] == "ELSE":
-            self.eat("ELSE")
-            self.eat("LBRACE")
-            else_body = self.parse_block()
-            self.eat("RBRACE")
-        return ASTNode("IF", children=[condition, body, else_body])
-
-    # Parsing a while loop
-    def parse_while(self):
-        self.eat("WHILE")
-        self.eat("LPAREN")
-        condition = self.parse_expression()
-        self.eat("RPAREN")
-        self.eat("LBRACE")
-        body = self.parse_block()
-        self.eat("RBRACE")
-        return ASTNode("WHILE", children=[condition, body])
-
-    # Parsing a for loop
-    def parse_for(self):
-        self.eat("FOR")
-        self.eat("LPAREN")
-        init = self.parse_expression()  # Initialization
-        self.eat("SEMI")
-        condition = self.parse_expression()  # Condition
-        self.eat("SEMI")
-        update = self.parse_expression()  # Update
-        self.eat("RPAREN")
-        self.eat("LBRACE")
-        body = self.parse_block()  # Body of loop
-        self.eat("RBRACE")
-        return ASTNode("FOR", children=[init, condition, update, body])
-
-    # Parsing function definition
-    def parse_function_def(self):
-        self.eat("DEF")
-        name = self.current_token[1]  # Function name
-        self.eat("ID")
-        self.eat("LPAREN")
-        params = []
-        while self.current_token and self.current_token[0] == "ID":
-            params.append(self.current_token[1])
+        return self.parse_statements(limit=1)[0]
+
+    # Parse statements up to the closing brace of the enclosing block, or
+    # only the first `limit` statements
+    def parse_statements(self, limit=None):
+        open_blocks = []  # (statement kind, line, parts parsed so far, outer statements)
+        statements = []
+        while True:
+            token = self.current_token
+            if token is None or token[0] == "RBRACE":
+                if not open_blocks:
+                    return statements
+                self.eat("RBRACE")
+                kind, line, parts, outer = open_blocks.pop()
+                parts.append(statements)
+                statements = outer
+                if kind == "IF" and len(parts) == 2:
+                    if self.current_token and self.current_token[0] == "ELSE":
+                        self.eat("ELSE")
+                        self.eat("LBRACE")
+                        open_blocks.append((kind, line, parts, statements))
+                        statements = []
+                        continue
+                    parts.append(None)
+                node = self.build_compound(kind, parts, line)
+            elif token[0] in COMPOUND_STATEMENTS:
+                open_blocks.append((token[0], token[2], self.parse_header(token[0]), statements))
+                statements = []
+                continue
+            else:
+                if token[0] == "RETURN":
+                    node = self.parse_return()
+                else:
+                    node = self.parse_expression()
+                if self.current_token and self.current_token[0] == "SEMICOLON":
+                    self.eat("SEMICOLON")
+            statements.append(node)
+            if limit is not None and not open_blocks and len(statements) >= limit:
+                return statements
+
+    # Parse a compound statement up to and including the opening brace of its
+    # body, returning the parts that precede the body
+    def parse_header(self, kind):
+        self.eat(kind)
+        if kind == "DEF":
+            name = self.current_token[1]  # Function name
             self.eat("ID")
-            if self.current_token and self.current_token[0] == "COMMA":
-                self.eat("COMMA")
-        self.eat("RPAREN")
+            self.eat("LPAREN")
+            params = []
+            while self.current_token and self.current_token[0] == "ID":
+                params.append(self.current_token[1])
+                self.eat("ID")
+                if self.current_token and self.current_token[0] == "COMMA":
+                    self.eat("COMMA")
+            self.eat("RPAREN")
+            parts = [name, params]
+        elif kind == "FOR":
+            self.eat("LPAREN")
+            init = self.parse_expression()  # Initialization
+            self.eat("SEMICOLON")
+            condition = self.parse_expression()  # Condition
+            self.eat("SEMICOLON")
+            update = self.parse_expression()  # Update
+            self.eat("RPAREN")
+            parts = [init, condition, update]
+        else:
+            # if and while
+            self.eat("LPAREN")
+            parts = [self.parse_expression()]
+            self.eat("RPAREN")
         self.eat("LBRACE")
-        body = self.parse_block()
-        self.eat("RBRACE")
-        return ASTNode("FUNC_DEF", value=name, children=params + [body])
+        return parts
+
+    def build_compound(self, kind, parts, line):
+        if kind == "IF":
+            return ASTNode("IF", children=parts, line=line)  # condition, body, else body
+        elif kind == "WHILE":
+            return ASTNode("WHILE", children=parts, line=line)  # condition, body
+        elif kind == "FOR":
+            return ASTNode("FOR", children=parts, line=line)  # init, condition, update, body
+        name, params, body = parts
+        return ASTNode("FUNC_DEF", value=name, children=params + [body], line=line)
 
     # Parsing return statement
     def parse_return(self):
+        token = self.current_token
         self.eat("RETURN")
-        return ASTNode("RETURN", children=[self.parse_expression()])
+        return ASTNode("RETURN", children=[self.parse_expression()], line=token[2])
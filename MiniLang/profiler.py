@@ -0,0 +1,100 @@
+# Execution profiler for the tree walker, enabled by Interpreter(profile=True).
+#
+# Every evaluate() of a node and every call of a user function is timed.
+# Node time is exclusive: the time of nested evaluations is subtracted, so
+# the per-type and per-line totals add up to the profiled run time instead
+# of counting nested expressions several times. Functions get both
+# inclusive time (outermost activation only, so recursion is not counted
+# twice) and exclusive time (minus nested function calls). Exclusive time
+# per call stack is kept for the collapsed-stack export read by
+# flamegraph.pl, speedscope and similar tools.
+
+import time
+
+TOP_LEVEL = "<program>"  # Name of the code outside any function
+
+
+class Profiler:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.node_types = {}  # Node type -> [evaluations, exclusive seconds]
+        self.lines = {}  # Source line -> [evaluations, exclusive seconds]
+        self.functions = {}  # Name -> [calls, evaluations, inclusive seconds, exclusive seconds]
+        self.stacks = {}  # Tuple of function names -> exclusive seconds
+        self.call_stack = []  # Names of the active calls, outermost first
+        self.calls = []  # Per active call: [start, seconds in nested calls, stats]
+        self.nodes = []  # Per active evaluation: [start, seconds in nested evaluations]
+        self.active = {}  # Name -> number of active calls
+
+    def enter_node(self):
+        self.nodes.append([self.clock(), 0.0])
+
+    def exit_node(self, node):
+        start, nested = self.nodes.pop()
+        elapsed = self.clock() - start
+        if self.nodes:
+            self.nodes[-1][1] += elapsed
+        exclusive = elapsed - nested
+        stats = self.node_types.get(node.type)
+        if stats is None:
+            stats = self.node_types[node.type] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += exclusive
+        stats = self.lines.get(node.line)
+        if stats is None:
+            stats = self.lines[node.line] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += exclusive
+        if self.calls:
+            self.calls[-1][2][1] += 1
+
+    def enter_call(self, name):
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = [0, 0, 0.0, 0.0]
+        self.call_stack.append(name)
+        self.active[name] = self.active.get(name, 0) + 1
+        self.calls.append([self.clock(), 0.0, stats])
+
+    def exit_call(self):
+        start, nested, stats = self.calls.pop()
+        elapsed = self.clock() - start
+        if self.calls:
+            self.calls[-1][1] += elapsed
+        stack = tuple(self.call_stack)
+        name = self.call_stack.pop()
+        self.active[name] -= 1
+        stats[0] += 1
+        if not self.active[name]:
+            stats[2] += elapsed
+        stats[3] += elapsed - nested
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed - nested
+
+    def report(self, limit=20):
+        # Text report: functions by inclusive time, then node types and
+        # source lines by exclusive time, each cut to the top `limit` rows
+        lines = [f"{'function':24s} {'calls':>9s} {'evals':>11s} {'incl ms':>11s} {'excl ms':>11s}"]
+        functions = sorted(self.functions.items(), key=lambda item: item[1][2], reverse=True)
+        for name, (calls, evaluations, inclusive, exclusive) in functions[:limit]:
+            lines.append(f"{name:24s} {calls:9d} {evaluations:11d} {inclusive * 1000:11.3f} {exclusive * 1000:11.3f}")
+        lines.append("")
+        lines.append(f"{'node type':24s} {'evals':>11s} {'excl ms':>11s} {'ns/eval':>9s}")
+        node_types = sorted(self.node_types.items(), key=lambda item: item[1][1], reverse=True)
+        for node_type, (evaluations, seconds) in node_types[:limit]:
+            lines.append(f"{node_type:24s} {evaluations:11d} {seconds * 1000:11.3f} {seconds / evaluations * 1e9:9.0f}")
+        lines.append("")
+        lines.append(f"{'line':24s} {'evals':>11s} {'excl ms':>11s}")
+        source_lines = sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)
+        for line, (evaluations, seconds) in source_lines[:limit]:
+            label = "?" if line is None else str(line)
+            lines.append(f"{label:24s} {evaluations:11d} {seconds * 1000:11.3f}")
+        return "\n".join(lines)
+
+    def collapsed(self):
+        # One "outer;inner;leaf microseconds" line per call stack
+        lines = []
+        for stack, seconds in sorted(self.stacks.items()):
+            microseconds = round(seconds * 1e6)
+            if microseconds > 0:
+                lines.append(f"{';'.join(stack)} {microseconds}")
+        return "\n".join(lines) + "\n" if lines else ""
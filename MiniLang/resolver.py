@@ -0,0 +1,177 @@
+# Resolves function bodies to slot-indexed locals ahead of execution.
+#
+# Parameters and every name assigned inside a function body are locals and
+# get a slot in the call frame, parameters first. All other names are read
+# from the shared global variables. A resolved body is a copy of the
+# FUNC_DEF body in which local ID nodes become LOCAL nodes whose value is
+# the slot index; the original tree is left untouched.
+#
+# The tree walker and the stack evaluator go one step further: resolve_globals
+# turns the remaining ID nodes into GLOBAL nodes indexing a list-backed
+# GlobalTable, and FUNC_CALL nodes into CALL nodes carrying a CallSite that
+# caches the callee until a function is defined or redefined.
+
+import copy
+from collections.abc import MutableMapping
+
+# Value of a global slot that has never been assigned
+UNSET = object()
+
+
+class FunctionInfo:
+    def __init__(self, func):
+        # FUNC_DEF children are the parameter names followed by the body block
+        self.name = func.value
+        self.params = list(func.children[:-1])
+        self.slots = {}  # Local name -> slot index
+        for param in self.params:
+            self.slots.setdefault(param, len(self.slots))
+        self.collect_locals(func.children[-1])
+        self.local_names = list(self.slots)
+        self.body = self.resolve(func.children[-1])
+
+    # Both walks below keep an explicit stack, so deeply nested bodies do not
+    # run into the recursion limit
+    def collect_locals(self, tree):
+        # Pre-order, so slots are numbered in source order
+        stack = [tree]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(reversed(item))
+            elif hasattr(item, "type") and item.type != "FUNC_DEF":
+                if item.type == "ASSIGN" and item.left.type == "ID":
+                    self.slots.setdefault(item.left.value, len(self.slots))
+                stack.extend(reversed(item.children))
+                stack.append(item.right)
+                stack.append(item.left)
+
+    def resolve(self, tree):
+        return copy_tree(tree, self.resolve_node)
+
+    def resolve_node(self, node):
+        if node.type == "ID" and node.value in self.slots:
+            node.type = "LOCAL"
+            node.value = self.slots[node.value]
+            return True
+        return False
+
+    def new_frame(self, variables, args):
+        # Locals start from the global of the same name, as they did when a
+        # call copied the whole variable table; parameters are bound on top
+        frame = [variables.get(name) for name in self.local_names]
+        count = min(len(args), len(self.params))
+        frame[:count] = args[:count]
+        return frame
+
+    def __repr__(self):
+        return f"<function {self.name} slots={self.local_names}>"
+
+
+def copy_tree(tree, rewrite):
+    # Copy the lists and nodes of tree top-down with an explicit stack, so
+    # deeply nested trees do not run into the recursion limit. Items are
+    # copied in pre-order, like collect_locals, so rewrite sees the nodes in
+    # source order. FUNC_DEF nodes are shared, not copied. rewrite(node) may
+    # change each copied node in place and returns True when the node's
+    # children are to be left as is
+    root = [tree]
+    pending = [(root, 0)]  # Where each item to copy is held: (list, index) or (node, attribute)
+    while pending:
+        holder, key = pending.pop()
+        item = holder[key] if type(key) is int else getattr(holder, key)
+        if isinstance(item, list):
+            item = list(item)
+            pending.extend((item, index) for index in range(len(item) - 1, -1, -1))
+        elif hasattr(item, "type") and item.type != "FUNC_DEF":
+            item = copy.copy(item)
+            if not rewrite(item):
+                if item.children:
+                    pending.append((item, "children"))
+                pending.append((item, "right"))
+                pending.append((item, "left"))
+        else:
+            continue
+        if type(key) is int:
+            holder[key] = item
+        else:
+            setattr(holder, key, item)
+    return root[0]
+
+
+# Global variables stored in a list by slot. Slots are handed out by name on
+# first use and never reused; the mapping interface is the dict API that
+# Interpreter.variables has always offered
+class GlobalTable(MutableMapping):
+    def __init__(self):
+        self.slots = {}  # Name -> slot index
+        self.names = []  # Slot index -> name
+        self.cells = []  # Slot index -> value, UNSET until assigned
+
+    def slot(self, name):
+        index = self.slots.get(name)
+        if index is None:
+            index = self.slots[name] = len(self.names)
+            self.names.append(name)
+            self.cells.append(UNSET)
+        return index
+
+    def get(self, name, default=None):
+        index = self.slots.get(name)
+        if index is None or self.cells[index] is UNSET:
+            return default
+        return self.cells[index]
+
+    def __getitem__(self, name):
+        index = self.slots.get(name)
+        if index is None or self.cells[index] is UNSET:
+            raise KeyError(name)
+        return self.cells[index]
+
+    def __setitem__(self, name, value):
+        self.cells[self.slot(name)] = value
+
+    def __delitem__(self, name):
+        index = self.slots.get(name)
+        if index is None or self.cells[index] is UNSET:
+            raise KeyError(name)
+        self.cells[index] = UNSET
+
+    def __iter__(self):
+        return (name for name, value in zip(self.names, self.cells) if value is not UNSET)
+
+    def __len__(self):
+        return sum(1 for value in self.cells if value is not UNSET)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+# Inline cache of a resolved call: the callee and its FunctionInfo, valid
+# while the interpreter's functions_version matches
+class CallSite:
+    __slots__ = ("name", "func", "info", "version")
+
+    def __init__(self, name):
+        self.name = name
+        self.func = None
+        self.info = None
+        self.version = -1
+
+
+def resolve_globals(tree, table):
+    # Copy of tree with ID nodes (including assignment targets) bound to
+    # slots of table and calls given call sites. Run it after FunctionInfo:
+    # in a resolved body the IDs left are the globals. FUNC_DEF nodes are not
+    # entered; their bodies are resolved when first called
+    def rewrite(node):
+        if node.type == "ID":
+            node.type = "GLOBAL"
+            node.value = table.slot(node.value)
+            return True
+        if node.type == "FUNC_CALL":
+            node.type = "CALL"
+            node.value = CallSite(node.value)
+        return False
+
+    return copy_tree(tree, rewrite)
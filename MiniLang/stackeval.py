@@ -0,0 +1,406 @@
+# Explicit-stack evaluation of the AST, the "stack" backend.
+#
+# The tree walker in interpreter.py recurses once per nested node and once
+# per MiniLang call, so long operator chains, deeply nested blocks and deep
+# recursion in scripts run into Python's recursion limit. This evaluator
+# keeps its pending work as (op, argument) pairs on a work list and
+# intermediate results on a value list, so nesting depth is bounded only by
+# memory. Results match the tree walker.
+#
+# Because all of its state lives in those lists, a run can also be paused:
+# start() returns an Execution and resume() advances it by a bounded number
+# of node evaluations, which is how Interpreter.run_async shares an event
+# loop between scripts.
+
+import operator
+import sys
+
+from arrays import BUILTINS, NumArray, builtin_result_bytes, make_array
+from compiler import BINARY_OPERATORS
+from errors import BudgetExceeded
+from lexer import number_value
+from memo import MISSING
+from resolver import UNSET
+
+# Work list operations
+EVAL = 0  # Evaluate a node and push its value
+CONST = 1  # Push the argument
+POP = 2  # Discard the top value
+APPLY = 3  # Replace the top two values with operator(left, right)
+STORE = 4  # Assign the top value to the target node, leaving it in place
+BRANCH = 5  # Pop an IF condition and run the matching branch
+WHILE_TEST = 6  # Pop a WHILE condition and run the body again or stop
+FOR_TEST = 7  # Same for FOR, running the update after the body
+RETURN = 8  # Pop the return value and unwind to the enclosing call
+CALL = 9  # Call a user function with the evaluated arguments
+CALL_BUILTIN = 10
+CALL_END = 11  # Leave a call: restore the caller's frame, memoize the result for each key
+BUILD_ARRAY = 12
+
+# Rough size of one pending work item: its list slot plus, usually, a fresh
+# (op, argument) tuple
+WORK_ITEM_BYTES = 64
+EMPTY_LIST_BYTES = sys.getsizeof([])
+# Block plans kept before the cache starts over; every run plans a freshly
+# resolved copy of its program
+MAX_PLANS = 4096
+
+
+# Paused state of a program on the stack evaluator
+class Execution:
+    __slots__ = ("work", "values", "frame", "steps", "done", "result", "memory_limit", "list_sizes", "value_sizes")
+
+    def __init__(self, work, memory_limit=None):
+        self.work = work
+        # Bytes no single new string, list or array may exceed; the total is
+        # checked by the caller between slices with memory()
+        self.memory_limit = memory_limit
+        self.values = []
+        self.frame = None  # Local slots of the innermost active call
+        self.steps = 0  # Nodes evaluated so far
+        self.done = False
+        self.result = None
+        # Sizes kept between memory() calls
+        self.list_sizes = {}  # id(list) -> (list, deep size)
+        self.value_sizes = ([], [])  # Copy of values, running total of their sizes
+
+    def memory(self, variables):
+        # Estimated bytes held by the run: pending work, intermediate values,
+        # the current frame and the global variables. Scripts never change a
+        # list in place, so the deep size of each list is kept from one call
+        # to the next, and so are the sizes of the values below the part of
+        # the value list that changed. A call then costs about the number of
+        # variables and new values, not the size of everything held
+        cached = self.list_sizes
+        list_sizes = {}
+
+        def size(value):
+            if isinstance(value, list):
+                entry = cached.get(id(value))
+                if entry is None or entry[0] is not value:
+                    entry = (value, deep_size(value))
+                list_sizes[id(value)] = entry
+                return entry[1]
+            return shallow_size(value)
+
+        values = self.values
+        old_values, totals = self.value_sizes
+        unchanged = list(map(operator.is_, values, old_values))
+        keep = unchanged.index(False) if False in unchanged else len(unchanged)
+        del totals[keep:]
+        running = totals[-1] if totals else 0
+        for value in values[keep:]:
+            running += size(value)
+            totals.append(running)
+        self.value_sizes = (list(values), totals)
+
+        total = len(self.work) * WORK_ITEM_BYTES + sys.getsizeof(variables) + running
+        held = list(variables.values())
+        if self.frame is not None:
+            held.extend(self.frame)
+        seen = set()
+        for value in held:
+            if id(value) not in seen:
+                seen.add(id(value))
+                total += size(value)
+        # Lists no longer held leave the cache
+        self.list_sizes = list_sizes
+        return total
+
+
+def shallow_size(value):
+    if isinstance(value, NumArray):
+        return sys.getsizeof(value) + sys.getsizeof(value.data)
+    return sys.getsizeof(value)
+
+
+def deep_size(items):
+    # Size of a list with everything it holds, counting shared objects once
+    total = 0
+    pending = [items]
+    seen = set()
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += shallow_size(value)
+        if isinstance(value, list):
+            pending.extend(value)
+    return total
+
+
+def value_bytes(value):
+    # Size of a string, list or array value itself, or of the digits of an
+    # int, which grows without bound; floats and booleans are not counted
+    if isinstance(value, NumArray):
+        return sys.getsizeof(value.data)
+    if isinstance(value, (str, list)):
+        return sys.getsizeof(value)
+    if type(value) is int:
+        return (value.bit_length() + 7) // 8
+    return 0
+
+
+def check_operands(op, left, right, memory_limit):
+    # A binary operator's result is never larger than its operands together
+    # (concatenation) and usually no larger than one of them (element-wise
+    # operators), so refuse before computing it. This stops doubling loops
+    # within a slice, before the memory() check between slices. Repetition
+    # ("ab" * 3) multiplies its sequence by the integer count instead, an
+    # int product has as many bits as its factors together (which is the
+    # sum already) and an int power about the base's bits times the exponent
+    size = value_bytes(left) + value_bytes(right)
+    if op is operator.mul:
+        if type(right) is int and isinstance(left, (str, list)):
+            size = value_bytes(left) * max(right, 1)
+        elif type(left) is int and isinstance(right, (str, list)):
+            size = value_bytes(right) * max(left, 1)
+    elif op is operator.pow and type(left) is int and type(right) is int and right > 0 and abs(left) > 1:
+        size = (left.bit_length() * right + 7) // 8
+    if size > memory_limit:
+        raise BudgetExceeded(f"Memory budget of {memory_limit} bytes exceeded")
+
+
+class StackEvaluator:
+    def __init__(self, interpreter):
+        # Variables and FUNC_DEF nodes live in the owning Interpreter's tables
+        self.interpreter = interpreter
+        self.plans = {}  # id(block) -> (block, work items)
+
+    def plan(self, block):
+        # Work items that run a block and leave the value of its last
+        # statement, in work list order (the first statement last)
+        entry = self.plans.get(id(block))
+        if entry is None or entry[0] is not block:
+            if not isinstance(block, list):
+                items = [(EVAL, block)]
+            elif not block:
+                items = [(CONST, None)]
+            else:
+                items = [(EVAL, block[-1])]
+                for stmt in reversed(block[:-1]):
+                    items.append((POP, None))
+                    items.append((EVAL, stmt))
+            entry = (block, items)
+            if len(self.plans) >= MAX_PLANS:
+                self.plans.clear()
+            self.plans[id(block)] = entry
+        return entry[1]
+
+    def tail_call(self, work, values, key):
+        # Whether a call's value is returned by its caller. The caller's
+        # remaining work and values are dropped, and the callee ends through
+        # the caller's CALL_END, so tail recursion runs in constant space.
+        # The memo key of a memoized callee is added to that CALL_END
+        if not work or work[-1][0] != RETURN:
+            return False
+        for index in range(len(work) - 2, -1, -1):
+            op, arg = work[index]
+            if op == CALL_END:
+                del work[index + 1:]
+                del values[arg[1]:]
+                if key is not None:
+                    frame, base, keys = arg
+                    if keys is None:
+                        work[index] = (CALL_END, (frame, base, [key]))
+                    else:
+                        self.interpreter.memo.chain(keys, key)
+                return True
+        return False
+
+    def run(self, program):
+        execution = self.start(program)
+        self.resume(execution)
+        return execution.result
+
+    def start(self, program, memory_limit=None):
+        return Execution(list(self.plan(program)), memory_limit)
+
+    def resume(self, execution, limit=None):
+        # Run until the program ends or `limit` more nodes have been
+        # evaluated; return whether it ended
+        interpreter = self.interpreter
+        variables = interpreter.variables
+        functions = interpreter.functions
+        memo = interpreter.memo
+        global_values = interpreter.global_values
+        frame = execution.frame
+        values = execution.values
+        work = execution.work
+        push = work.append
+        pop = work.pop
+        steps = execution.steps
+        stop = sys.maxsize if limit is None else steps + limit
+        memory_limit = execution.memory_limit
+        while work:
+            if steps >= stop:
+                execution.frame = frame
+                execution.steps = steps
+                return False
+            op, arg = pop()
+            if op == EVAL:
+                steps += 1
+                node_type = arg.type
+                if node_type in BINARY_OPERATORS:
+                    push((APPLY, BINARY_OPERATORS[node_type]))
+                    push((EVAL, arg.right))
+                    push((EVAL, arg.left))
+                elif node_type == "NUMBER":
+                    value = arg.value
+                    values.append(number_value(value) if type(value) is str else value)
+                elif node_type == "GLOBAL":
+                    value = global_values[arg.value]
+                    values.append(None if value is UNSET else value)
+                elif node_type == "LOCAL":
+                    values.append(frame[arg.value])
+                elif node_type == "ID":
+                    values.append(variables.get(arg.value, None))
+                elif node_type == "STRING" or node_type == "BOOLEAN":
+                    values.append(arg.value)
+                elif node_type == "ASSIGN":
+                    push((STORE, arg.left))
+                    push((EVAL, arg.right))
+                elif node_type == "IF":
+                    push((BRANCH, arg))
+                    push((EVAL, arg.children[0]))
+                elif node_type == "WHILE":
+                    push((WHILE_TEST, arg))
+                    push((EVAL, arg.children[0]))
+                elif node_type == "FOR":
+                    push((FOR_TEST, arg))
+                    push((EVAL, arg.children[1]))
+                    push((POP, None))
+                    push((EVAL, arg.children[0]))
+                elif node_type == "FUNC_CALL" or node_type == "CALL":
+                    if node_type == "CALL":
+                        # Resolved call: reuse the callee cached on the call site
+                        site = arg.value
+                        if site.version != interpreter.functions_version:
+                            site.func = functions.get(site.name)
+                            site.info = interpreter.function_info(site.func) if site.func else None
+                            site.version = interpreter.functions_version
+                        name, func, info = site.name, site.func, site.info
+                    else:
+                        name = arg.value
+                        func = functions.get(name)
+                        info = interpreter.function_info(func) if func else None
+                    if func:
+                        arg_nodes = arg.children[:len(info.params)]
+                        push((CALL, (func, info, len(arg_nodes))))
+                    elif name in BUILTINS:
+                        arg_nodes = arg.children
+                        push((CALL_BUILTIN, (BUILTINS[name], len(arg_nodes))))
+                    else:
+                        raise ValueError(f"Function {name} not defined")
+                    for child in reversed(arg_nodes):
+                        push((EVAL, child))
+                elif node_type == "RETURN":
+                    push((RETURN, None))
+                    push((EVAL, arg.children[0]))
+                elif node_type == "FUNC_DEF":
+                    interpreter.define_function(arg)
+                    values.append(None)
+                elif node_type == "ARRAY":
+                    push((BUILD_ARRAY, len(arg.children)))
+                    for child in reversed(arg.children):
+                        push((EVAL, child))
+                else:
+                    raise ValueError(f"Unknown node type: {node_type}")
+            elif op == APPLY:
+                right = values.pop()
+                if memory_limit is not None:
+                    check_operands(arg, values[-1], right, memory_limit)
+                values[-1] = arg(values[-1], right)
+            elif op == POP:
+                values.pop()
+            elif op == STORE:
+                if arg.type == "GLOBAL":
+                    global_values[arg.value] = values[-1]
+                elif arg.type == "LOCAL":
+                    frame[arg.value] = values[-1]
+                else:
+                    variables[arg.value] = values[-1]
+            elif op == CONST:
+                values.append(arg)
+            elif op == BRANCH:
+                if values.pop():
+                    work.extend(self.plan(arg.children[1]))
+                elif arg.children[2]:
+                    work.extend(self.plan(arg.children[2]))
+                else:
+                    values.append(None)
+            elif op == WHILE_TEST:
+                if values.pop():
+                    push((WHILE_TEST, arg))
+                    push((EVAL, arg.children[0]))
+                    push((POP, None))
+                    work.extend(self.plan(arg.children[1]))
+                else:
+                    values.append(None)
+            elif op == FOR_TEST:
+                if values.pop():
+                    push((FOR_TEST, arg))
+                    push((EVAL, arg.children[1]))
+                    push((POP, None))
+                    push((EVAL, arg.children[2]))
+                    push((POP, None))
+                    work.extend(self.plan(arg.children[3]))
+                else:
+                    values.append(None)
+            elif op == CALL:
+                func, info, count = arg
+                start = len(values) - count
+                args = values[start:]
+                del values[start:]
+                key = None
+                if interpreter.memoized(func):
+                    key, result = memo.lookup(func, args)
+                    if result is not MISSING:
+                        values.append(result)
+                        continue
+                if not self.tail_call(work, values, key):
+                    push((CALL_END, (frame, len(values), None if key is None else [key])))
+                frame = info.new_frame(variables, args)
+                work.extend(self.plan(info.body))
+            elif op == CALL_END:
+                # The callee's body left its result on top of the caller's values
+                frame, _, keys = arg
+                if keys is not None:
+                    for key in reversed(keys):
+                        memo.store(key, values[-1])
+            elif op == RETURN:
+                # Drop the rest of the callee's work and values; a return
+                # outside any function ends the program
+                result = values.pop()
+                while work:
+                    op, arg = pop()
+                    if op == CALL_END:
+                        break
+                else:
+                    values.append(result)
+                    break
+                del values[arg[1]:]
+                values.append(result)
+                push((CALL_END, arg))
+            elif op == CALL_BUILTIN:
+                func, count = arg
+                start = len(values) - count
+                args = values[start:]
+                del values[start:]
+                if memory_limit is not None and builtin_result_bytes(func, args) > memory_limit:
+                    raise BudgetExceeded(f"Memory budget of {memory_limit} bytes exceeded")
+                values.append(func(*args))
+            elif op == BUILD_ARRAY:
+                start = len(values) - arg
+                # A list of arg pointers, or arg packed doubles
+                if memory_limit is not None and EMPTY_LIST_BYTES + 8 * arg > memory_limit:
+                    raise BudgetExceeded(f"Memory budget of {memory_limit} bytes exceeded")
+                items = values[start:]
+                del values[start:]
+                values.append(make_array(items))
+        execution.frame = frame
+        execution.steps = steps
+        execution.done = True
+        execution.result = values[-1]
+        return True
@@ -0,0 +1,373 @@
+# Translates ASTs into Python source for CPython to compile, the "python"
+# backend.
+#
+# A program becomes one generated Python function and every MiniLang
+# function another: WHILE and FOR become native loops, arithmetic native
+# operators and function locals Python locals, so hot code runs as CPython
+# bytecode. Globals stay in Interpreter.variables and functions are looked up
+# by name at each call (through a cache dropped whenever a function is
+# defined), so redefinition, builtins and memoization behave as on the other
+# backends. What the translator cannot express (AND/OR, unknown node types,
+# nesting beyond what CPython's compiler accepts) runs on the tree walker:
+# a top-level statement on its own, a function as a whole.
+#
+# Every generated line remembers the source line it came from. An error
+# raised in generated code gets a note naming that line, and the generated
+# source is registered with linecache so the Python traceback shows it.
+
+import itertools
+import linecache
+import math
+import sys
+import weakref
+
+from arrays import BUILTINS, make_array
+from errors import ReturnException
+from lexer import number_value
+from resolver import FunctionInfo
+
+# Translations kept in each of programs and functions before it starts over
+MAX_TRANSLATIONS = 1024
+
+# Python operators of the arithmetic and comparison node types
+OPERATORS = {
+    "ADD": "+",
+    "SUB": "-",
+    "MUL": "*",
+    "DIV": "/",
+    "MOD": "%",
+    "POWER": "**",
+    "EQ": "==",
+    "NEQ": "!=",
+    "GT": ">",
+    "LT": "<",
+    "LEQ": "<=",
+    "GEQ": ">=",
+}
+
+# Deepest expression and block nesting translated. CPython's parser refuses
+# more than 200 nested parentheses (a call adds two) and its compiler more
+# than 20 nested blocks
+MAX_EXPRESSION_DEPTH = 60
+MAX_BLOCK_DEPTH = 15
+
+# Default of a parameter the caller did not pass; it starts from the global
+# of the same name instead
+NOT_PASSED = object()
+
+# Numbers the file names of generated units, which linecache shares
+# process-wide
+_unit_numbers = itertools.count(1)
+
+
+class Untranslatable(Exception):
+    pass
+
+
+# Python source of one program or function under construction
+class Unit:
+    def __init__(self, name, local_names=None):
+        self.name = name
+        # Python names of the local slots; None for the program, which has no
+        # locals and may hand single statements to the tree walker
+        self.local_names = local_names
+        self.lines = []
+        self.source_lines = []  # MiniLang line of each generated line
+        self.constants = []  # Values the code reads as _k[index]
+        self.indent = 1
+        self.temps = 0
+
+    def emit(self, text, line):
+        self.lines.append("    " * self.indent + text)
+        self.source_lines.append(line)
+
+    def constant(self, value):
+        self.constants.append(value)
+        return f"_k[{len(self.constants) - 1}]"
+
+    def rollback(self, size, indent):
+        del self.lines[size:]
+        del self.source_lines[size:]
+        self.indent = indent
+
+    # Emit the statements of a block. target is "return" to return the value
+    # of the last statement or None to drop it; a block's value is that of
+    # its last statement
+    def block(self, block, target, depth):
+        if depth > MAX_BLOCK_DEPTH:
+            raise Untranslatable("blocks nested too deeply")
+        if not isinstance(block, list):
+            block = [block]
+        start = len(self.lines)
+        for index, stmt in enumerate(block):
+            self.statement(stmt, target if index == len(block) - 1 else None, depth)
+        if not block:
+            self.finish(target, "None", None)
+        if len(self.lines) == start:
+            self.emit("pass", None)
+
+    def statement(self, node, target, depth):
+        if self.local_names is not None:
+            self.translate_statement(node, target, depth)
+            return
+        size, indent = len(self.lines), self.indent
+        try:
+            self.translate_statement(node, target, depth)
+        except Untranslatable:
+            # A nested block may have failed while indented further
+            self.rollback(size, indent)
+            self.finish(target, f"_eval({self.constant(node)})", node.line)
+
+    def translate_statement(self, node, target, depth):
+        node_type = node.type
+        line = node.line
+        if node_type == "IF":
+            self.emit(f"if {self.expression(node.children[0])}:", line)
+            self.nested(node.children[1], target, depth)
+            else_body = node.children[2] if len(node.children) > 2 else None
+            if else_body:
+                self.emit("else:", line)
+                self.nested(else_body, target, depth)
+            elif target is not None:
+                self.emit("else:", line)
+                self.nested([], target, depth)
+        elif node_type == "WHILE":
+            self.emit(f"while {self.expression(node.children[0])}:", line)
+            self.nested(node.children[1], None, depth)
+            self.finish(target, "None", line)
+        elif node_type == "FOR":
+            init, condition, update, body = node.children
+            self.statement(init, None, depth)
+            self.emit(f"while {self.expression(condition)}:", line)
+            self.indent += 1
+            self.block(body, None, depth + 1)
+            self.statement(update, None, depth + 1)
+            self.indent -= 1
+            self.finish(target, "None", line)
+        elif node_type == "FUNC_DEF":
+            self.emit(f"_define({self.constant(node)})", line)
+            self.finish(target, "None", line)
+        elif node_type == "RETURN":
+            self.emit(f"return {self.expression(node.children[0])}", line)
+        elif node_type == "ASSIGN" and target is None:
+            value = self.expression(node.right)
+            if node.left.type == "LOCAL":
+                self.emit(f"{self.local_names[node.left.value]} = {value}", line)
+            else:
+                self.emit(f"_vars[{node.left.value!r}] = {value}", line)
+        else:
+            self.finish(target, self.expression(node), line)
+
+    def nested(self, block, target, depth):
+        self.indent += 1
+        self.block(block, target, depth + 1)
+        self.indent -= 1
+
+    def finish(self, target, value, line):
+        if target == "return":
+            self.emit(f"return {value}", line)
+        elif value != "None":
+            self.emit(value, line)
+
+    def expression(self, node, depth=0):
+        if depth > MAX_EXPRESSION_DEPTH:
+            raise Untranslatable("expression nested too deeply")
+        node_type = node.type
+        if node_type in OPERATORS:
+            left = self.expression(node.left, depth + 1)
+            right = self.expression(node.right, depth + 1)
+            return f"({left} {OPERATORS[node_type]} {right})"
+        if node_type == "NUMBER" or node_type == "STRING" or node_type == "BOOLEAN":
+            return self.literal(node)
+        if node_type == "LOCAL":
+            return self.local_names[node.value]
+        if node_type == "ID":
+            return f"_get({node.value!r})"
+        if node_type == "FUNC_CALL":
+            return self.call(node, depth)
+        if node_type == "ASSIGN":
+            value = self.expression(node.right, depth + 1)
+            if node.left.type == "LOCAL":
+                return f"({self.local_names[node.left.value]} := {value})"
+            return f"_assign({node.left.value!r}, {value})"
+        if node_type == "ARRAY":
+            elements = ", ".join(self.expression(child, depth + 1) for child in node.children)
+            return f"_array([{elements}])"
+        raise Untranslatable(f"{node_type} nodes")
+
+    def literal(self, node):
+        value = node.value
+        if node.type == "NUMBER" and type(value) is str:
+            value = number_value(value)
+        if type(value) is float and not math.isfinite(value) or type(value) not in (int, float, str, bool):
+            return self.constant(value)
+        # repr() refuses ints beyond sys.get_int_max_str_digits() digits, and
+        # long literals would only bloat the source anyway
+        if type(value) is int and value.bit_length() > 64:
+            return self.constant(value)
+        text = repr(value)
+        return f"({text})" if text.startswith("-") else text
+
+    def call(self, node, depth):
+        # The callee is looked up before the arguments are evaluated, and
+        # only as many arguments as it has parameters are evaluated (all of
+        # them for a builtin), as on the tree walker. Each argument appears
+        # once, guarded by the callee's parameter count, so nested calls grow
+        # the source linearly; the arguments the guards skip are passed as
+        # None and land in the callee's *_extra
+        name = repr(node.value)
+        if not node.children:
+            return f"_callee({name})[0]()"
+        temp = f"_c{self.temps}"
+        self.temps += 1
+        args = [
+            f"{self.expression(arg, depth + 1)} if {temp}[1] > {index} else None"
+            for index, arg in enumerate(node.children)
+        ]
+        return f"({temp} := _callee({name}))[0]({', '.join(args)})"
+
+    def source(self, parameters=""):
+        return "\n".join([f"def _unit({parameters}):"] + self.lines) + "\n"
+
+
+class Transpiler:
+    def __init__(self, interpreter):
+        # Variables and FUNC_DEF nodes live in the owning Interpreter's tables
+        self.interpreter = interpreter
+        self.programs = {}  # id(program) -> (program, Python function or None)
+        self.functions = {}  # id(FUNC_DEF node) -> (node, Python function)
+        self.callees = {}  # Name -> (callable, parameter count), for the current functions
+        self.version = -1  # interpreter.functions_version that self.callees belongs to
+        # Generated file name -> its Python function, whose minilang_lines
+        # holds (source lines, MiniLang line of each) for as long as it lives
+        self.units = weakref.WeakValueDictionary()
+        variables = interpreter.variables
+
+        def assign(name, value):
+            variables[name] = value
+            return value
+
+        # Names the generated code reads besides its own _k constants
+        self.namespace = {
+            "_vars": variables,
+            "_get": variables.get,
+            "_assign": assign,
+            "_array": make_array,
+            "_callee": self.callee,
+            "_define": interpreter.define_function,
+            "_eval": interpreter.evaluate,
+            "_NOT_PASSED": NOT_PASSED,
+        }
+
+    def run(self, program):
+        entry = self.programs.get(id(program))
+        if entry is None or entry[0] is not program:
+            entry = (program, self.translate_program(program))
+            if len(self.programs) >= MAX_TRANSLATIONS:
+                self.programs.clear()
+            self.programs[id(program)] = entry
+        function = entry[1]
+        try:
+            if function is None:
+                return self.interpreter.execute_block(program)
+            return function()
+        except ReturnException as signal:
+            return signal.value
+        except Exception as error:
+            self.annotate(error)
+            raise
+
+    def translate_program(self, program):
+        # The program's Python function, or None to run it on the tree walker
+        unit = Unit("<program>")
+        try:
+            unit.block(program, "return", 0)
+            return self.build(unit)
+        except (Untranslatable, SyntaxError, RecursionError, MemoryError):
+            return None
+
+    def function(self, func):
+        entry = self.functions.get(id(func))
+        if entry is None or entry[0] is not func:
+            entry = (func, self.translate_function(func))
+            if len(self.functions) >= MAX_TRANSLATIONS:
+                self.functions.clear()
+            self.functions[id(func)] = entry
+        return entry[1]
+
+    def translate_function(self, func):
+        info = FunctionInfo(func)
+        names = [f"v{slot}" for slot in range(len(info.local_names))]
+        unit = Unit(info.name, names)
+        try:
+            # Locals start from the global of the same name, parameters
+            # from the caller's arguments when it passed them
+            for slot, name in enumerate(info.local_names):
+                if slot < len(info.params):
+                    unit.emit(f"if {names[slot]} is _NOT_PASSED:", func.line)
+                    unit.indent += 1
+                    unit.emit(f"{names[slot]} = _get({name!r})", func.line)
+                    unit.indent -= 1
+                else:
+                    unit.emit(f"{names[slot]} = _get({name!r})", func.line)
+            unit.block(info.body, "return", 0)
+            parameters = [f"{name}=_NOT_PASSED" for name in names[:len(info.params)]]
+            return self.build(unit, ", ".join(parameters + ["*_extra"]))
+        except (Untranslatable, SyntaxError, RecursionError, MemoryError):
+            info = self.interpreter.function_info(func)
+            return lambda *args: self.interpreter.call_function(info, list(args[:len(info.params)]))
+
+    def build(self, unit, parameters=""):
+        source = unit.source(parameters)
+        filename = f"<minilang-{next(_unit_numbers)} {unit.name}>"
+        namespace = dict(self.namespace, _k=unit.constants)
+        exec(compile(source, filename, "exec"), namespace)
+        function = namespace["_unit"]
+        # Line 1 is the def line, which belongs to no statement
+        function.minilang_lines = (source.splitlines(True), [None] + unit.source_lines)
+        self.units[filename] = function
+        return function
+
+    def callee(self, name):
+        # (callable, parameter count) of the function a call by name reaches
+        if self.version != self.interpreter.functions_version:
+            self.callees.clear()
+            self.version = self.interpreter.functions_version
+        entry = self.callees.get(name)
+        if entry is None:
+            entry = self.callees[name] = self.resolve(name)
+        return entry
+
+    def resolve(self, name):
+        interpreter = self.interpreter
+        func = interpreter.functions.get(name)
+        if not func:
+            if name in BUILTINS:
+                return (BUILTINS[name], sys.maxsize)
+            raise ValueError(f"Function {name} not defined")
+        function = self.function(func)
+        count = len(func.children) - 1
+        if interpreter.memoized(func):
+            memo = interpreter.memo
+
+            def memoized(*args):
+                args = args[:count]
+                return memo.call(func, list(args), lambda: function(*args))
+            return (memoized, count)
+        return (function, count)
+
+    def annotate(self, error):
+        # Add the source line of the innermost generated frame to the error
+        # and make the generated code visible in the Python traceback
+        line = None
+        traceback = error.__traceback__
+        while traceback is not None:
+            filename = traceback.tb_frame.f_code.co_filename
+            function = self.units.get(filename)
+            if function is not None:
+                lines, source_lines = function.minilang_lines
+                linecache.cache[filename] = (sum(map(len, lines)), None, lines, filename)
+                line = source_lines[traceback.tb_lineno - 1]
+            traceback = traceback.tb_next
+        if line is not None and hasattr(error, "add_note"):
+            error.add_note(f"MiniLang line {line}")
@@ -0,0 +1,160 @@
+# Stack-based virtual machine for code objects produced by compiler.py
+
+from arrays import BUILTINS, make_array
+from compiler import (
+    BINARY_OP, BINARY_OP_CONST, BINARY_OP_NAME, BINARY_OP_NAME_CONST, BINARY_OP_NAME_NAME, BUILD_LIST,
+    BINARY_OP_FAST_CONST, BINARY_OP_TOP_FAST_CONST, BINARY_OP_TOP_NAME_CONST, CALL_FUNCTION, DEF_FUNCTION, JUMP,
+    JUMP_IF_FALSE, JUMP_UNLESS_FAST_CONST, JUMP_UNLESS_NAME_CONST, JUMP_UNLESS_NAME_NAME, LOAD_CONST, LOAD_FAST,
+    LOAD_NAME, POP_TOP, RETURN_VALUE, STORE_FAST, STORE_FAST_OP_CONST, STORE_FAST_POP, STORE_NAME,
+    STORE_NAME_OP_CONST, STORE_NAME_POP, TAIL_CALL, compile_function, compile_program,
+)
+from memo import MISSING
+
+# Compiled functions kept before function_codes starts over
+MAX_FUNCTION_CODES = 1024
+
+
+class VM:
+    def __init__(self, interpreter):
+        # Variables and FUNC_DEF nodes live in the owning Interpreter's tables
+        self.interpreter = interpreter
+        self.function_codes = {}  # id(FUNC_DEF node) -> (node, CodeObject)
+
+    def run(self, program):
+        return self.execute(compile_program(program), self.interpreter.variables)
+
+    def function_code(self, func):
+        entry = self.function_codes.get(id(func))
+        if entry is None or entry[0] is not func:
+            entry = (func, compile_function(func))
+            if len(self.function_codes) >= MAX_FUNCTION_CODES:
+                self.function_codes.clear()
+            self.function_codes[id(func)] = entry
+        return entry[1]
+
+    def call(self, name, args):
+        func = self.interpreter.functions.get(name)
+        if not func:
+            if name in BUILTINS:
+                return BUILTINS[name](*args)
+            raise ValueError(f"Function {name} not defined")
+        code = self.function_code(func)
+        variables = self.interpreter.variables
+        if self.interpreter.memoized(func):
+            return self.interpreter.memo.call(
+                func, args, lambda: self.execute(code, variables, code.function.new_frame(variables, args)))
+        return self.execute(code, variables, code.function.new_frame(variables, args))
+
+
+    def execute(self, code, variables, frame=None):
+        instructions = code.instructions
+        constants = code.constants
+        names = code.names
+        get = variables.get
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        memo_keys = None  # Memo keys of memoized functions tail-called here
+        # Opcodes are tested roughly in order of how often loops execute them
+        while True:
+            instruction = instructions[pc]
+            opcode = instruction[0]
+            pc += 1
+            if opcode == STORE_NAME_OP_CONST:
+                variables[names[instruction[1]]] = instruction[2](get(names[instruction[3]]), constants[instruction[4]])
+            elif opcode == JUMP_UNLESS_NAME_CONST:
+                if not instruction[2](get(names[instruction[3]]), constants[instruction[4]]):
+                    pc = instruction[1]
+            elif opcode == JUMP:
+                pc = instruction[1]
+            elif opcode == LOAD_NAME:
+                push(get(names[instruction[1]]))
+            elif opcode == BINARY_OP_TOP_NAME_CONST:
+                stack[-1] = instruction[1](stack[-1], instruction[2](get(names[instruction[3]]), constants[instruction[4]]))
+            elif opcode == STORE_NAME_POP:
+                variables[names[instruction[1]]] = pop()
+            elif opcode == JUMP_UNLESS_NAME_NAME:
+                if not instruction[2](get(names[instruction[3]]), get(names[instruction[4]])):
+                    pc = instruction[1]
+            elif opcode == BINARY_OP_NAME_CONST:
+                push(instruction[1](get(names[instruction[2]]), constants[instruction[3]]))
+            elif opcode == BINARY_OP:
+                right = pop()
+                stack[-1] = instruction[1](stack[-1], right)
+            elif opcode == BINARY_OP_CONST:
+                stack[-1] = instruction[1](stack[-1], constants[instruction[2]])
+            elif opcode == BINARY_OP_NAME:
+                stack[-1] = instruction[1](stack[-1], get(names[instruction[2]]))
+            elif opcode == BINARY_OP_NAME_NAME:
+                push(instruction[1](get(names[instruction[2]]), get(names[instruction[3]])))
+            elif opcode == LOAD_FAST:
+                push(frame[instruction[1]])
+            elif opcode == STORE_FAST_OP_CONST:
+                frame[instruction[1]] = instruction[2](frame[instruction[3]], constants[instruction[4]])
+            elif opcode == BINARY_OP_TOP_FAST_CONST:
+                stack[-1] = instruction[1](stack[-1], instruction[2](frame[instruction[3]], constants[instruction[4]]))
+            elif opcode == BINARY_OP_FAST_CONST:
+                push(instruction[1](frame[instruction[2]], constants[instruction[3]]))
+            elif opcode == JUMP_UNLESS_FAST_CONST:
+                if not instruction[2](frame[instruction[3]], constants[instruction[4]]):
+                    pc = instruction[1]
+            elif opcode == STORE_FAST_POP:
+                frame[instruction[1]] = pop()
+            elif opcode == LOAD_CONST:
+                push(constants[instruction[1]])
+            elif opcode == JUMP_IF_FALSE:
+                if not pop():
+                    pc = instruction[1]
+            elif opcode == POP_TOP:
+                pop()
+            elif opcode == STORE_NAME:
+                variables[names[instruction[1]]] = stack[-1]
+            elif opcode == STORE_FAST:
+                frame[instruction[1]] = stack[-1]
+            elif opcode == CALL_FUNCTION:
+                name, argc = constants[instruction[1]]
+                args = stack[len(stack) - argc:]
+                del stack[len(stack) - argc:]
+                push(self.call(name, args))
+            elif opcode == RETURN_VALUE:
+                if memo_keys is not None:
+                    for key in reversed(memo_keys):
+                        self.interpreter.memo.store(key, stack[-1])
+                return pop()
+            elif opcode == TAIL_CALL:
+                name, argc = constants[instruction[1]]
+                args = stack[len(stack) - argc:]
+                del stack[len(stack) - argc:]
+                func = self.interpreter.functions.get(name)
+                key, result = None, MISSING
+                if not func:
+                    result = self.call(name, args)
+                elif self.interpreter.memoized(func):
+                    key, result = self.interpreter.memo.lookup(func, args)
+                if result is not MISSING:
+                    push(result)
+                else:
+                    # The call's value is returned as is: run the callee in
+                    # place of this code instead of nesting another execute().
+                    # A memoized callee's result is stored when it returns
+                    if key is not None:
+                        if memo_keys is None:
+                            memo_keys = []
+                        self.interpreter.memo.chain(memo_keys, key)
+                    code = self.function_code(func)
+                    instructions = code.instructions
+                    constants = code.constants
+                    names = code.names
+                    frame = code.function.new_frame(variables, args)
+                    del stack[:]
+                    pc = 0
+            elif opcode == BUILD_LIST:
+                count = instruction[1]
+                values = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(make_array(values))
+            elif opcode == DEF_FUNCTION:
+                self.interpreter.define_function(constants[instruction[1]])
+            else:
+                raise ValueError(f"Unknown opcode: {opcode}")
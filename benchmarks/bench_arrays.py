@@ -0,0 +1,59 @@
+# Packed arrays: element-wise script against a scripted WHILE loop, and the
+# memory of a packed array against a list of boxed floats
+
+import argparse
+import tracemalloc
+
+from common import best_of
+
+from arrays import builtin_range
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+SCRIPTED = """
+i = 0; total = 0;
+while (i < {n}) {{ x = i * 0.5; total = total + x * x + 1; i = i + 1; }}
+total
+"""
+
+VECTORIZED = """
+x = range({n}) * 0.5;
+total = sum(x * x + 1);
+total
+"""
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    value = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del value
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure packed numeric arrays")
+    parser.add_argument("--n", type=int, default=10000000, help="elements for the vectorized run")
+    parser.add_argument("--scripted-n", type=int, default=1000000, help="iterations for the scripted loop")
+    parser.add_argument("--backend", default="closure", choices=BACKENDS)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    program = Parser(tokenize(SCRIPTED.format(n=args.scripted_n))).parse_program()
+    scripted, result = best_of(lambda: Interpreter(args.backend).run(program), args.repeat)
+    print(f"scripted loop  {args.scripted_n:9d} elements  {scripted:8.3f} s  {scripted / args.scripted_n * 1e9:8.1f} ns/element  {result}")
+
+    for n in (args.scripted_n, args.n):
+        program = Parser(tokenize(VECTORIZED.format(n=n))).parse_program()
+        vectorized, result = best_of(lambda: Interpreter(args.backend).run(program), args.repeat)
+        print(f"vectorized     {n:9d} elements  {vectorized:8.3f} s  {vectorized / n * 1e9:8.1f} ns/element  {result}")
+
+    boxed = peak_memory(lambda: [float(index) for index in range(args.n)])
+    packed = peak_memory(lambda: builtin_range(args.n))
+    print(f"memory for {args.n} elements: list {boxed / 1e6:.1f} MB, packed {packed / 1e6:.1f} MB ({boxed / packed:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Cooperative execution: hundreds of scripts interleaved on one event loop
+# with Interpreter.run_async, against running them back to back. Reports
+# throughput, per-script completion latency and event loop lag (how late a
+# 1 ms heartbeat task wakes up) for several slice sizes
+
+import argparse
+import asyncio
+import random
+import time
+
+import common  # noqa: F401  (puts MiniLang/ on the path)
+
+from interpreter import Interpreter
+from lexer import tokenize
+from parser import Parser
+
+SCRIPT = """
+def f(n) {{ if (n < 2) {{ return n; }} return f(n - 1) + f(n - 2); }}
+i = 0; total = 0;
+while (i < {n}) {{ total = total + i % 7; i = i + 1; }}
+total + f({fib})
+"""
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def heartbeat(lags, stop):
+    # Sleep 1 ms at a time and record how late each wakeup is
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.001
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - expected)
+
+
+async def run_batch(programs, slice_steps):
+    lags = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+
+    async def timed(program):
+        if slice_steps is None:
+            Interpreter("stack").run(program)  # Blocks the loop until done
+        else:
+            await Interpreter().run_async(program, slice_steps=slice_steps)
+        return time.perf_counter() - start
+
+    latencies = await asyncio.gather(*(timed(program) for program in programs))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+    return elapsed, latencies, lags or [0.0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure run_async throughput and latency")
+    parser.add_argument("--scripts", type=int, default=300, help="concurrent scripts")
+    parser.add_argument("--n", type=int, nargs=2, default=[100, 2000], help="range of loop lengths")
+    parser.add_argument("--fib", type=int, default=8)
+    parser.add_argument("--slices", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    generator = random.Random(0)
+    programs = [
+        Parser(tokenize(SCRIPT.format(n=generator.randint(*args.n), fib=args.fib))).parse_program()
+        for _ in range(args.scripts)
+    ]
+    print(f"{args.scripts} scripts")
+    print(f"{'mode':>14s} {'total s':>8s} {'scripts/s':>10s} {'p50 done':>9s} {'p99 done':>9s} "
+          f"{'lag p50 ms':>10s} {'lag p99 ms':>10s} {'lag max ms':>10s}")
+    for slice_steps in [None] + args.slices:
+        elapsed, latencies, lags = asyncio.run(run_batch(programs, slice_steps))
+        mode = "sequential" if slice_steps is None else f"slice {slice_steps}"
+        print(f"{mode:>14s} {elapsed:8.3f} {len(programs) / elapsed:10.0f} "
+              f"{percentile(latencies, 0.5):9.3f} {percentile(latencies, 0.99):9.3f} "
+              f"{percentile(lags, 0.5) * 1000:10.2f} {percentile(lags, 0.99) * 1000:10.2f} {max(lags) * 1000:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
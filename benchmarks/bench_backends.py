@@ -0,0 +1,56 @@
+# Execution backends on loop-heavy programs, with results checked for equality
+
+import argparse
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+PROGRAMS = {
+    "while_sum": """
+        i = 0; total = 0;
+        while (i < {n}) {{ total = total + i * 2 - i % 7; i = i + 1; }}
+        total
+    """,
+    "for_nested": """
+        acc = 0;
+        for (i = 0; i < {n} / 100; i = i + 1) {{
+            for (j = 0; j < 100; j = j + 1) {{ if (j > i) {{ acc = acc + 1; }} else {{ acc = acc - 1; }} }}
+        }}
+        acc
+    """,
+    "calls": """
+        def step(x, y) {{ return x * y + 1; }}
+        i = 0; total = 0;
+        while (i < {n} / 10) {{ total = step(total, 0.5); i = i + 1; }}
+        total
+    """,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare execution backends")
+    parser.add_argument("--n", type=int, default=100000, help="loop iterations per program")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    for name, template in PROGRAMS.items():
+        program = Parser(tokenize(template.format(n=args.n))).parse_program()
+        timings = {}
+        results = {}
+        for backend in args.backends:
+            def run():
+                interpreter = Interpreter(backend=backend)
+                return interpreter.run(program), interpreter.variables
+            timings[backend], results[backend] = best_of(run, args.repeat)
+        baseline = timings[args.backends[0]]
+        for backend in args.backends:
+            same = "ok" if results[backend] == results[args.backends[0]] else "MISMATCH"
+            print(f"{name:12s} {backend:8s} {timings[backend]:8.3f} s  {baseline / timings[backend]:6.2f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Batch throughput: scripts per second through run_many / BatchRunner as the
+# number of worker processes grows, against running them one by one
+
+import argparse
+import os
+
+from common import best_of
+
+from batch import BatchRunner, run_script
+
+SCRIPT = """
+def f(n) {{ if (n < 2) {{ return n; }} return f(n - 1) + f(n - 2); }}
+i = 0; total = {seed};
+while (i < {n}) {{ total = total + i % 7; i = i + 1; }}
+result = total + f({fib});
+"""
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Measure run_many throughput scaling")
+    parser.add_argument("--scripts", type=int, default=2000)
+    parser.add_argument("--n", type=int, default=200, help="loop iterations per script")
+    parser.add_argument("--fib", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, cpus}))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sources = [SCRIPT.format(seed=i, n=args.n, fib=args.fib) for i in range(args.scripts)]
+    serial, _ = best_of(lambda: [run_script(source) for source in sources], args.repeat)
+    print(f"{cpus} CPUs, {args.scripts} scripts")
+    print(f"{'serial':>10s}  {args.scripts / serial:9.0f} scripts/s  1.00x")
+    for workers in args.workers:
+        with BatchRunner(workers) as runner:
+            runner.run(sources[:workers * 4])  # Warm the workers up
+            elapsed, results = best_of(lambda: runner.run(sources), args.repeat)
+        failed = sum(1 for result in results if not result.ok)
+        print(f"{workers:7d} wk  {args.scripts / elapsed:9.0f} scripts/s  {serial / elapsed:4.2f}x  ({failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
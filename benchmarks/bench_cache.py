@@ -0,0 +1,36 @@
+# AST cache: cold start (lex + parse + optimize) against warm start (cache read)
+
+import argparse
+import shutil
+import tempfile
+
+from common import best_of
+
+from astcache import ProgramCache
+
+FUNCTION = "def f{i}(x) {{ y = x * {i} + 1; if (y > 10) {{ return y - 2 * 3; }} return y; }}\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold and warm starts through the AST cache")
+    parser.add_argument("--functions", type=int, default=5000, help="function definitions in the script")
+    parser.add_argument("-O", dest="opt_level", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    source = "".join(FUNCTION.format(i=i) for i in range(args.functions)) + "f1(2)\n"
+    cache_dir = tempfile.mkdtemp(prefix="mlcache-")
+    try:
+        cache = ProgramCache(cache_dir)
+        cold, _ = best_of(lambda: cache.parse(source, args.opt_level), args.repeat)
+        cache.load(source, args.opt_level)
+        warm, _ = best_of(lambda: cache.load(source, args.opt_level), args.repeat)
+        print(f"source {len(source)} chars, -O{args.opt_level}")
+        print(f"cold  {cold * 1000:9.2f} ms  (lex + parse + optimize)")
+        print(f"warm  {warm * 1000:9.2f} ms  (cache read)  {cold / warm:5.1f}x")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Function call cost as the global scope grows, and recursive fib
+
+import argparse
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+CALL_LOOP = """
+def add(a, b) {{ c = a + b; return c; }}
+i = 0; total = 0;
+while (i < {calls}) {{ total = add(total, i); i = i + 1; }}
+total
+"""
+
+FIB = """
+def fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+fib(%d)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure function call cost")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--globals", type=int, nargs="+", default=[10, 1000, 10000], help="extra global variables")
+    parser.add_argument("--fib", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    program = Parser(tokenize(CALL_LOOP.format(calls=args.calls))).parse_program()
+    for backend in args.backends:
+        for count in args.globals:
+            def run():
+                interpreter = Interpreter(backend=backend)
+                interpreter.variables.update((f"g{index}", float(index)) for index in range(count))
+                return interpreter.run(program)
+            elapsed, _ = best_of(run, args.repeat)
+            print(f"{backend:8s} {count:6d} globals  {elapsed / args.calls * 1e6:8.2f} us/call")
+
+    program = Parser(tokenize(FIB % args.fib)).parse_program()
+    for backend in args.backends:
+        elapsed, result = best_of(lambda: Interpreter(backend=backend).run(program), 1)
+        print(f"{backend:8s} fib({args.fib}) = {result:.0f}  {elapsed:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Deep and long programs: parse and run times of the explicit-stack backend
+# on inputs that overflow the recursive tree walker
+
+import argparse
+import time
+
+from common import best_of
+
+from interpreter import Interpreter
+from lexer import tokenize
+from optimizer import count_nodes
+from parser import Parser
+
+
+def generate(case, nodes, depth):
+    if case == "chain":  # 1 + 1 + ... + 1, nested to the left
+        return " + ".join(["1"] * (nodes // 2))
+    if case == "nested":  # 1 + (1 + (... + 1)), nested to the right
+        terms = nodes // 2
+        return "1 + (" * (terms - 1) + "1" + ")" * (terms - 1)
+    if case == "ifs":  # if (x) { if (x) { ... } }
+        levels = nodes // 2
+        return "x = 1; " + "if (x) { " * levels + "x = 2" + " }" * levels
+    if case == "recursion":  # depth nested MiniLang calls
+        return f"def f(n) {{ if (n == 0) {{ return 0; }} return 1 + f(n - 1); }} f({depth})"
+    raise ValueError(f"Unknown case: {case}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the parser and the stack backend with deep programs")
+    parser.add_argument("--nodes", type=int, default=1000000, help="approximate AST size of each program")
+    parser.add_argument("--depth", type=int, default=100000, help="call depth of the recursion case")
+    parser.add_argument("--cases", nargs="+", default=["chain", "nested", "ifs", "recursion"])
+    parser.add_argument("--tree", action="store_true", help="also try the recursive tree backend")
+    args = parser.parse_args()
+
+    for case in args.cases:
+        tokens = tokenize(generate(case, args.nodes, args.depth))
+        start = time.perf_counter()
+        program = Parser(tokens).parse_program()
+        parsed = time.perf_counter() - start
+        elapsed, result = best_of(lambda: Interpreter("stack").run(program), 1)
+        line = f"{case:10s} {count_nodes(program):8d} nodes  parse {parsed:7.3f} s  stack {elapsed:7.3f} s  result {result}"
+        if args.tree:
+            try:
+                Interpreter("tree").run(program)
+                line += "  tree ok"
+            except RecursionError:
+                line += "  tree RecursionError"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Global variable reads and writes and calls of global functions, the paths
+# served by resolved global slots and per-call-site function caches
+
+import argparse
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+CASES = {
+    "loop": """
+i = 0; total = 0; step = 3;
+while (i < {n}) {{ total = total + i * step % 7; i = i + 1; }}
+total
+""",
+    "calls": """
+def square(x) {{ return x * x; }}
+i = 0; total = 0;
+while (i < {n}) {{ total = total + square(i % 10); i = i + 1; }}
+total
+""",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure global variable access and global function calls")
+    parser.add_argument("--n", type=int, default=100000, help="loop iterations")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for case, source in CASES.items():
+        program = Parser(tokenize(source.format(n=args.n))).parse_program()
+        for backend in args.backends:
+            elapsed, result = best_of(lambda: Interpreter(backend).run(program), args.repeat)
+            print(f"{case:6s} {backend:8s} {elapsed:8.3f} s  result {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Latency of one keystroke-sized edit with incremental re-lexing and
+# re-parsing (incremental.Document) against tokenizing and parsing the whole
+# edited source again, as the source grows
+
+import argparse
+import time
+
+from common import best_of
+
+from incremental import Document
+from lexer import tokenize
+from parser import Parser
+
+CHUNK = """def step{index}(a, b) {{
+    total = a * {index} + b;
+    if (total > 100) {{ total = total % 100; }}
+    return total;
+}}
+value{index} = step{index}({index}, 7);
+label{index} = "line {index}"; // running label
+"""
+CHUNK_LINES = CHUNK.count("\n")
+
+# Edits made in the middle of the source, each undone by the next one so the
+# source stays valid: (name, text to find, offset within it, inserted text)
+EDITS = [
+    ("digit", "* {index} +", 2, "5"),  # Typing inside a number
+    ("newline", "b;\n", 2, "\n"),  # Breaking a line, which moves every later line
+    ("string", '"line {index}"', 5, "x"),  # Typing inside a string
+]
+
+
+def generate(lines):
+    return "".join(CHUNK.format(index=index) for index in range(max(1, lines // CHUNK_LINES)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare incremental and full re-parsing of edited sources")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 50000], help="source sizes in lines")
+    parser.add_argument("--edits", type=int, default=200, help="edits timed per case")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        source = generate(lines)
+        middle = lines // CHUNK_LINES // 2
+        start = time.perf_counter()
+        document = Document(source)
+        print(f"{lines} lines: initial parse {time.perf_counter() - start:.3f} s")
+        full, _ = best_of(lambda: Parser(tokenize(source)).parse_program(), args.repeat)
+        for name, anchor, shift, text in EDITS:
+            offset = source.index(anchor.format(index=middle)) + shift
+
+            def edit():
+                for _ in range(args.edits // 2):
+                    document.edit(offset, 0, text)
+                    document.edit(offset, len(text), "")
+
+            elapsed, _ = best_of(edit, args.repeat)
+            per_edit = elapsed / (args.edits // 2 * 2)
+            print(
+                f"  {name:8s} incremental {per_edit * 1e6:9.1f} us/edit  full {full * 1e3:9.1f} ms  "
+                f"{full / per_edit:8.0f}x  ({document.relexed} tokens, {document.reparsed} statements)"
+            )
+        assert document.tokens == tokenize(source)
+
+
+if __name__ == "__main__":
+    main()
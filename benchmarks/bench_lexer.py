@@ -0,0 +1,59 @@
+# Lexer throughput: master-pattern tokenize against the original per-pattern loop
+
+import argparse
+import re
+
+from common import best_of, generate_source
+
+from lexer import TOKEN_TYPES, tokenize
+
+
+def legacy_tokenize(code):
+    # The original tokenize: compile and try every TOKEN_TYPES entry in order
+    # at each position until one matches
+    tokens = []
+    line_number = 1
+    position = 0
+    while position < len(code):
+        match = None
+        for token_type, pattern in TOKEN_TYPES:
+            regex = re.compile(pattern)
+            match = regex.match(code, position)
+            if match:
+                text = match.group(0)
+                if token_type != "SKIP" and token_type != "COMMENT":
+                    tokens.append((token_type, text, line_number))
+                position += len(text)
+                if token_type == "NEWLINE":
+                    line_number += 1
+                break
+        if not match:
+            raise SyntaxError(f"Unexpected character: {code[position]}")
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lexer throughput")
+    parser.add_argument("--size", type=int, default=256, help="input size in KiB for the comparison run")
+    parser.add_argument("--large", type=int, default=8192, help="input size in KiB for the master-pattern-only run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    code = generate_source(args.size * 1024)
+    megabytes = len(code) / 1e6
+    legacy_time, legacy_tokens = best_of(lambda: legacy_tokenize(code), args.repeat)
+    master_time, master_tokens = best_of(lambda: tokenize(code), args.repeat)
+    print(f"input: {megabytes:.2f} MB")
+    print(f"legacy tokenize: {legacy_time:8.3f} s  {megabytes / legacy_time:8.2f} MB/s  {len(legacy_tokens)} tokens")
+    print(f"master pattern:  {master_time:8.3f} s  {megabytes / master_time:8.2f} MB/s  {len(master_tokens)} tokens")
+    print(f"speedup: {legacy_time / master_time:.1f}x")
+
+    code = generate_source(args.large * 1024)
+    megabytes = len(code) / 1e6
+    master_time, master_tokens = best_of(lambda: tokenize(code), args.repeat)
+    print(f"\nlarge input: {megabytes:.2f} MB")
+    print(f"master pattern:  {master_time:8.3f} s  {megabytes / master_time:8.2f} MB/s  {len(master_tokens)} tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Memoization of pure functions: time with and without the LRU cache
+
+import argparse
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+PROGRAM = """
+def weight(x) {{ y = x * x - 3 * x + 2; z = y / (x + 1); return z * z + y; }}
+def fib(n) {{ if (n < 2) {{ return n; }} return fib(n - 1) + fib(n - 2); }}
+i = 0; total = 0;
+while (i < {n}) {{ total = total + weight(i % {distinct}); i = i + 1; }}
+total + fib({fib})
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure pure function memoization")
+    parser.add_argument("--n", type=int, default=50000, help="calls to the helper")
+    parser.add_argument("--distinct", type=int, default=16, help="distinct helper arguments")
+    parser.add_argument("--fib", type=int, default=20)
+    parser.add_argument("--memo-size", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    program = Parser(tokenize(PROGRAM.format(n=args.n, distinct=args.distinct, fib=args.fib))).parse_program()
+    for backend in args.backends:
+        for memo_size in (0, args.memo_size):
+            def run():
+                interpreter = Interpreter(backend, memo_size=memo_size)
+                return interpreter.run(program), interpreter
+            elapsed, (result, interpreter) = best_of(run, args.repeat)
+            stats = interpreter.memo.stats() if interpreter.memo else "off"
+            print(f"{backend:8s} memo {memo_size:5d}  {elapsed:8.3f} s  result {result}  {stats}")
+
+
+if __name__ == "__main__":
+    main()
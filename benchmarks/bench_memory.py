@@ -0,0 +1,73 @@
+# AST memory: bytes per node of the __slots__ ASTNode against the previous
+# dict-backed node that gave every leaf its own empty children list
+
+import argparse
+import gc
+import tracemalloc
+
+import common  # noqa: F401  (puts MiniLang/ on the path)
+
+from astnode import ASTNode
+from lexer import tokenize
+from optimizer import count_nodes
+from parser import Parser
+
+CHUNK = (
+    "total = total + values * 2.5 - offset % 7;\n"
+    "if (total >= limit && flag != false) { count = count + 1; } else { count = 0; }\n"
+    "while (i <= 100) { i = i + 1; label = \"step\"; }\n"
+    "def scale(x, k) { return x * k + f(x - 1, k); }\n"
+)
+
+
+class DictASTNode:
+    def __init__(self, type_, value=None, left=None, right=None, children=None):
+        self.type = type_
+        self.value = value
+        self.left = left
+        self.right = right
+        self.children = children if children else []
+
+
+def rebuild(tree, node_class):
+    # Copy the tree into node_class nodes, sharing the leaf values
+    if isinstance(tree, list):
+        return [rebuild(item, node_class) for item in tree]
+    if not hasattr(tree, "type"):
+        return tree
+    return node_class(
+        tree.type,
+        tree.value,
+        rebuild(tree.left, node_class),
+        rebuild(tree.right, node_class),
+        [rebuild(child, node_class) for child in tree.children],
+    )
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure AST memory per node")
+    parser.add_argument("--chunks", type=int, default=5000, help="copies of the sample script")
+    args = parser.parse_args()
+
+    program = Parser(tokenize(CHUNK * args.chunks)).parse_program()
+    nodes = count_nodes(program)
+    print(f"{nodes} nodes")
+    baseline = None
+    for name, node_class in (("dict-backed node", DictASTNode), ("ASTNode (__slots__)", ASTNode)):
+        size, _ = measure(lambda: rebuild(program, node_class))
+        baseline = baseline or size
+        print(f"{name:20s} {size / nodes:7.1f} bytes/node  {size / 2**20:8.1f} MiB  {size / baseline:5.0%}")
+
+
+if __name__ == "__main__":
+    main()
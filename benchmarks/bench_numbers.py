@@ -0,0 +1,56 @@
+# Counter-heavy WHILE and FOR loops with integer literals (exact int
+# arithmetic) against the same loops written with float literals
+
+import argparse
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+CASES = {
+    "while": """
+i = {zero}; total = {zero};
+while (i < {n}) {{ total = total + i % {seven}; i = i + {one}; }}
+total
+""",
+    "for": """
+total = {zero};
+for (i = {zero}; i < {n}; i = i + {one}) {{
+    for (j = {zero}; j < {inner}; j = j + {one}) {{ total = total + j; }}
+}}
+total
+""",
+}
+
+LITERALS = {
+    "int": {"zero": "0", "one": "1", "seven": "7"},
+    "float": {"zero": "0.0", "one": "1.0", "seven": "7.0"},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare integer and float loop counters on every backend")
+    parser.add_argument("--n", type=int, default=100000, help="outer loop iterations")
+    parser.add_argument("--inner", type=int, default=3, help="inner iterations of the FOR case")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("-O", "--opt-level", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for case, source in CASES.items():
+        for backend in args.backends:
+            times = {}
+            for kind, literals in LITERALS.items():
+                text = source.format(n=args.n, inner=args.inner, **literals)
+                program = Parser(tokenize(text)).parse_program()
+                times[kind], result = best_of(lambda: Interpreter(backend, opt_level=args.opt_level).run(program), args.repeat)
+            print(
+                f"{case:6s} {backend:8s} int {times['int']:7.3f} s  float {times['float']:7.3f} s  "
+                f"{times['float'] / times['int']:5.2f}x  result {result}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Optimizer: nodes eliminated and run time at each opt level
+
+import argparse
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from optimizer import Optimizer
+from parser import Parser
+
+PROGRAM = """
+seconds = 0; i = 0; debug = false;
+while (i < {n}) {{
+    seconds = seconds + 2 * 60 * 60 + (i * 1) / (24 * 1);
+    if (debug) {{ seconds = 0; }}
+    if (1 > 2) {{ seconds = seconds - 1; }} else {{ seconds = seconds + 0.5 * 2; }}
+    i = i + 1;
+}}
+seconds
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the AST optimizer")
+    parser.add_argument("--n", type=int, default=50000, help="loop iterations")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    program = Parser(tokenize(PROGRAM.format(n=args.n))).parse_program()
+    for level in range(4):
+        optimizer = Optimizer(level)
+        optimizer.optimize(program)
+        print(f"-O{level}: {optimizer.report}")
+    for backend in args.backends:
+        for level in range(4):
+            elapsed, result = best_of(lambda: Interpreter(backend, opt_level=level).run(program), args.repeat)
+            print(f"{backend:8s} -O{level}  {elapsed:8.3f} s  result {result}")
+
+
+if __name__ == "__main__":
+    main()
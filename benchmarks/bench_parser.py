@@ -0,0 +1,50 @@
+# Parser scaling: time per token should stay flat as the token count grows.
+# parse_program makes the cyclic GC collect rarely while the tree grows, so
+# the "gc off" column should roughly match;
+# what remains of the rise at a million tokens is allocating the tree itself
+
+import argparse
+import gc
+
+from common import best_of
+
+from lexer import tokenize
+from parser import Parser
+
+STATEMENTS = (
+    "total = total + (price * 3 - discount) / 2;\n"
+    "if (total >= limit) { count = count + 1; } else { count = 0; }\n"
+    "while (i < 10) { i = i + 1; }\n"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure parser scaling")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000], help="token counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    unit = tokenize(STATEMENTS)
+    for size in args.sizes:
+        tokens = unit * max(1, size // len(unit))
+
+        def parse():
+            # Drop each tree before the next run, so that no run pays for
+            # holding two of them
+            Parser(tokens).parse_program()
+
+        elapsed, _ = best_of(parse, args.repeat)
+        gc.disable()
+        try:
+            no_gc_elapsed, _ = best_of(parse, args.repeat)
+        finally:
+            gc.enable()
+        program = Parser(tokens).parse_program()
+        print(
+            f"{len(tokens):9d} tokens  {elapsed:8.3f} s  {elapsed / len(tokens) * 1e9:8.1f} ns/token"
+            f"  (gc off {no_gc_elapsed / len(tokens) * 1e9:8.1f} ns/token)  {len(program)} statements"
+        )
+
+
+if __name__ == "__main__":
+    main()
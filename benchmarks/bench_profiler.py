@@ -0,0 +1,36 @@
+# Profiler overhead: the tree walker with and without profile=True
+
+import argparse
+
+from common import best_of
+
+from interpreter import Interpreter
+from lexer import tokenize
+from parser import Parser
+
+PROGRAM = """
+def fib(n) {{ if (n < 2) {{ return n; }} return fib(n - 1) + fib(n - 2); }}
+i = 0; total = 0;
+while (i < {n}) {{ total = total + i * i % 7; i = i + 1; }}
+total + fib({fib})
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of the execution profiler")
+    parser.add_argument("--n", type=int, default=50000, help="loop iterations")
+    parser.add_argument("--fib", type=int, default=18)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    program = Parser(tokenize(PROGRAM.format(n=args.n, fib=args.fib))).parse_program()
+    baseline = None
+    for profile in (False, True):
+        elapsed, result = best_of(lambda: Interpreter(profile=profile).run(program), args.repeat)
+        baseline = baseline or elapsed
+        label = "profiled" if profile else "plain"
+        print(f"{label:9s} {elapsed:8.3f} s  {elapsed / baseline:5.2f}x  result {result}")
+
+
+if __name__ == "__main__":
+    main()
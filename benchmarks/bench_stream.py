@@ -0,0 +1,51 @@
+# Streaming lexer: throughput and peak memory of iter_tokens over a file,
+# against materializing the whole token list with tokenize
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from common import generate_source
+
+from lexer import iter_tokens, tokenize
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure streaming lexer memory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4], help="script sizes in MB")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        fd, path = tempfile.mkstemp(suffix=".ml")
+        with os.fdopen(fd, "w") as handle:
+            handle.write(generate_source(size * 1000 * 1000))
+        try:
+            def streamed():
+                with open(path) as handle:
+                    return sum(1 for _ in iter_tokens(handle))
+
+            def materialized():
+                with open(path) as handle:
+                    return len(tokenize(handle.read()))
+
+            for name, func in (("iter_tokens", streamed), ("tokenize", materialized)):
+                elapsed, peak, count = measure(func)
+                print(f"{size:4d} MB  {name:12s} {elapsed:8.2f} s  peak {peak / 1e6:9.2f} MB  {count} tokens")
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# Regression suite: times the lexer, the parser and the interpreter
+# separately on synthetic workloads, records the peak memory of each phase
+# with tracemalloc, writes the results as JSON and compares them with a
+# stored baseline.
+#
+#   python bench_suite.py --save-baseline baseline.json    # on the old tree
+#   python bench_suite.py --baseline baseline.json         # on the new tree
+#
+# The second run prints every time and peak memory next to the baseline's
+# and exits with status 1 if any of them grew by more than --threshold
+# (times) or --memory-threshold (peak memory). Workloads are generated
+# deterministically from --scale, so runs with the same settings measure
+# the same programs; baselines recorded with other settings are refused.
+
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import tracemalloc
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+FORMAT_VERSION = 1
+
+PHASES = ("tokenize", "parse", "evaluate")
+
+
+def arithmetic_chains(scale):
+    # Long operator chains mixing every precedence level. Scaling adds
+    # chains rather than lengthening them, which keeps them within what the
+    # recursive backends can nest
+    lines = ["a = 3; b = 7; c = 2;"]
+    for index in range(max(1, int(150 * scale))):
+        unit = f"+ a - {index % 9 + 1} * b + (c * 2) / a"
+        lines.append(f"v{index} = {index} " + " ".join([unit] * 30) + ";")
+    lines.append("v0")
+    return "\n".join(lines)
+
+
+def loops(scale):
+    # Tight WHILE and FOR counter loops
+    n = int(50000 * scale)
+    return f"""
+i = 0; total = 0;
+while (i < {n}) {{ total = total + i % 7; i = i + 1; }}
+for (j = 0; j < {n // 10}; j = j + 1) {{
+    for (k = 0; k < 10; k = k + 1) {{ total = total - k; }}
+}}
+total
+"""
+
+
+def recursion(scale):
+    # Tree recursion, whose call count doubles with each level, plus a
+    # shallow tail-recursive accumulator that every backend can run
+    depth = max(2, 18 + round(math.log2(scale)))
+    return f"""
+def fib(n) {{ if (n < 2) {{ return n; }} return fib(n - 1) + fib(n - 2); }}
+def count(n, acc) {{ if (n == 0) {{ return acc; }} return count(n - 1, acc + n); }}
+fib({depth}) + count(100, 0)
+"""
+
+
+def arrays(scale):
+    # Large numeric and mixed ARRAY literals with element-wise arithmetic
+    size = int(20000 * scale)
+    numbers = ", ".join(str(index % 100) for index in range(size))
+    mixed = ", ".join(f'"s{index}"' if index % 3 == 0 else str(index) for index in range(size // 4))
+    return f"""
+a = [{numbers}];
+b = a * 2 + a;
+names = [{mixed}];
+sum(b) + len(names)
+"""
+
+
+def many_functions(scale):
+    # Many small functions, each calling one with half its number (so calls
+    # nest only logarithmically deep), then calls to every one of them
+    count = max(1, int(500 * scale))
+    lines = ["def f0(x) { return x + 1; }"]
+    for index in range(1, count):
+        lines.append(f"def f{index}(x) {{ y = x * 2 - {index % 5}; return f{index // 2}(y % 1000) + 1; }}")
+    lines.append("total = 0;")
+    for start in range(0, count, 50):
+        calls = " + ".join(f"f{index}({index})" for index in range(start, min(start + 50, count)))
+        lines.append(f"total = total + {calls};")
+    lines.append("total")
+    return "\n".join(lines)
+
+
+WORKLOADS = {
+    "arithmetic": arithmetic_chains,
+    "loops": loops,
+    "recursion": recursion,
+    "arrays": arrays,
+    "functions": many_functions,
+}
+
+
+def peak_memory(func):
+    # Peak bytes allocated while func runs, above what was allocated before
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(source, backend, opt_level, repeat, memory):
+    tokens = tokenize(source)
+    program = Parser(tokens).parse_program()
+    steps = {
+        "tokenize": lambda: tokenize(source),
+        "parse": lambda: Parser(tokens).parse_program(),
+        "evaluate": lambda: Interpreter(backend, opt_level=opt_level).run(program),
+    }
+    result = {"tokens": len(tokens), "statements": len(program)}
+    for phase in PHASES:
+        gc.collect()
+        seconds, value = best_of(steps[phase], repeat)
+        result[phase] = {"seconds": seconds}
+        if memory:
+            result[phase]["peak_bytes"] = peak_memory(steps[phase])
+        if phase == "evaluate":
+            result["value"] = repr(value)
+    return result
+
+
+def run_suite(args):
+    results = {}
+    for name in args.workloads:
+        source = WORKLOADS[name](args.scale)
+        results[name] = measure(source, args.backend, args.opt_level, args.repeat, not args.no_memory)
+        entry = results[name]
+        print(
+            f"{name:11s} {entry['tokens']:8d} tokens  "
+            + "  ".join(f"{phase} {entry[phase]['seconds']:8.4f} s" for phase in PHASES)
+        )
+    return {
+        "version": FORMAT_VERSION,
+        "settings": {
+            "scale": args.scale,
+            "backend": args.backend,
+            "opt_level": args.opt_level,
+            "repeat": args.repeat,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold, memory_threshold, min_time):
+    # Print each measurement against the baseline and return the
+    # regressions. Times under min_time in both runs are too noisy to judge
+    if baseline.get("version") != FORMAT_VERSION:
+        raise SystemExit(f"Baseline format {baseline.get('version')} is not {FORMAT_VERSION}")
+    settings = {key: value for key, value in report["settings"].items() if key != "repeat"}
+    recorded = {key: value for key, value in baseline["settings"].items() if key != "repeat"}
+    if settings != recorded:
+        raise SystemExit(f"Baseline was recorded with {recorded}, this run uses {settings}")
+    regressions = []
+    print(f"\n{'workload':11s} {'phase':13s} {'baseline':>11s} {'current':>11s} {'':3s} {'change':>8s}")
+    for name, entry in report["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:11s} not in the baseline")
+            continue
+        if old.get("value") != entry["value"]:
+            regressions.append(f"{name}: result {entry['value']} differs from the baseline's {old.get('value')}")
+        for phase in PHASES:
+            if phase not in old:
+                continue
+            checks = [("seconds", threshold, 1e3, "ms")]
+            if "peak_bytes" in entry[phase] and "peak_bytes" in old[phase]:
+                checks.append(("peak_bytes", memory_threshold, 1 / 1024, "KiB"))
+            for key, limit, factor, unit in checks:
+                before, after = old[phase][key], entry[phase][key]
+                change = after / before - 1 if before else 0.0
+                flag = ""
+                if change > limit and not (key == "seconds" and max(before, after) < min_time):
+                    flag = "  REGRESSION"
+                    regressions.append(f"{name} {phase} {key}: {before:.6g} -> {after:.6g} ({change:+.1%})")
+                label = phase if key == "seconds" else f"{phase} mem"
+                print(f"{name:11s} {label:13s} {before * factor:11.2f} {after * factor:11.2f} {unit:3s} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the lexer, parser and interpreter benchmark suite")
+    parser.add_argument("--scale", type=float, default=1.0, help="workload size multiplier")
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS), choices=WORKLOADS)
+    parser.add_argument("--backend", default="tree", choices=BACKENDS)
+    parser.add_argument("-O", "--opt-level", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc passes")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as the new baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare with a baseline written by --save-baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown (0.15 = 15%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="allowed relative peak memory growth")
+    parser.add_argument("--min-time", type=float, default=0.005, help="seconds below which times are not compared")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(report, file, indent=2)
+                file.write("\n")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold, args.memory_threshold, args.min_time)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
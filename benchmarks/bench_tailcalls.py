@@ -0,0 +1,70 @@
+# Tail-recursive functions against the same loops written with WHILE, on the
+# backends that run tail calls in place (tree, stack and vm): time, and the
+# peak memory of a run, which stays flat as the recursion gets deeper
+
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from common import best_of
+
+from interpreter import Interpreter
+from lexer import tokenize
+from parser import Parser
+
+CASES = {
+    "tail": """
+def count(n, acc) {{ if (n == 0) {{ return acc; }} return count(n - 1, acc + n % 7); }}
+count({n}, 0)
+""",
+    "mutual": """
+def ping(n, acc) {{ if (n == 0) {{ return acc; }} return pong(n - 1, acc + 1); }}
+def pong(n, acc) {{ if (n == 0) {{ return acc; }} return ping(n - 1, acc + 2); }}
+ping({n}, 0)
+""",
+    "while": """
+def count(n, acc) {{ while (n > 0) {{ acc = acc + n % 7; n = n - 1; }} return acc; }}
+count({n}, 0)
+""",
+}
+
+BACKENDS = ("tree", "stack", "vm")
+
+
+def peak_memory(run):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time tail-recursive functions and measure their peak memory")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="recursion depths")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--memory", action="store_true", help="also trace peak memory (slow)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Python recursion limit: {sys.getrecursionlimit()}")
+    for case, source in CASES.items():
+        for backend in args.backends:
+            for size in args.sizes:
+                program = Parser(tokenize(source.format(n=size))).parse_program()
+
+                def run():
+                    return Interpreter(backend).run(program)
+
+                elapsed, result = best_of(run, args.repeat)
+                line = f"{case:7s} {backend:6s} n={size:<8d} {elapsed:8.3f} s  {elapsed / size * 1e6:6.2f} us/iter"
+                if args.memory:
+                    line += f"  peak {peak_memory(run) / 1024:8.1f} KiB"
+                print(f"{line}  result {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# The main.py scenarios (assignment, arithmetic, a function call, an IF and an
+# array literal) scaled up into a loop, on every backend, with the python
+# backend's translation time reported separately
+
+import argparse
+import time
+
+from common import best_of
+
+from interpreter import BACKENDS, Interpreter
+from lexer import tokenize
+from parser import Parser
+
+PROGRAM = """
+def square(x) {{ return x * x; }}
+total = 0;
+for (i = 0; i < {n}; i = i + 1) {{
+    x = 10;
+    total = total + (5 + 3) - (10 - 4);
+    total = total + square(i % 5);
+    if (true) {{ y = 100; }} else {{ y = 200; }}
+    array = [1, 2, 3];
+}}
+[total, x, y]
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the main.py scenarios in a loop on every backend")
+    parser.add_argument("--n", type=int, default=50000, help="loop iterations")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    program = Parser(tokenize(PROGRAM.format(n=args.n))).parse_program()
+    baseline = None
+    for backend in args.backends:
+        elapsed, result = best_of(lambda: Interpreter(backend).run(program), args.repeat)
+        baseline = baseline or elapsed
+        print(f"{backend:8s} {elapsed:8.3f} s  {baseline / elapsed:6.2f}x  result {result}")
+
+    # Translation and compile() cost alone, on a program that does no work
+    empty = Parser(tokenize(PROGRAM.format(n=0))).parse_program()
+    start = time.perf_counter()
+    Interpreter("python").run(empty)
+    print(f"translate {(time.perf_counter() - start) * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
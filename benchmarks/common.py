@@ -0,0 +1,37 @@
+# Shared helpers for the benchmark scripts
+
+import os
+import sys
+import time
+
+# The interpreter modules live side by side in MiniLang/ and import each other
+# by bare name, so put that directory on the path before importing them.
+MINILANG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "MiniLang")
+if MINILANG_DIR not in sys.path:
+    sys.path.insert(0, MINILANG_DIR)
+
+
+def best_of(func, repeat=3):
+    # Return the fastest wall time of several runs, plus the last result
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def generate_source(size):
+    # Build a synthetic script of roughly `size` characters that exercises
+    # identifiers, keywords, numbers, strings, comments and every operator
+    chunk = (
+        "// accumulate a running total\n"
+        "total = total + values[3] * 2.5 - offset % 7;\n"
+        "if (total >= limit && flag != false) { count = count + 1; }\n"
+        "while (i <= 100) { i = i + 1; label = \"step\"; }\n"
+        "ratio = (a / b) ^ 2 == c || d < e -> f;\n"
+    )
+    return chunk * max(1, size // len(chunk))